@@ -45,6 +45,12 @@ GEMINI_ANALYSIS_CONCURRENCY = max(
 DATABASE_URL = os.environ.get("DATABASE_URL")
 DEFAULT_SQLITE_PATH = PROJECT_ROOT / "local_sessions.db" # Ostane za referenco
 
+# Bazen povezav do PostgreSQL baze znanja
+KNOWLEDGE_DB_POOL_SIZE = int(os.environ.get("KNOWLEDGE_DB_POOL_SIZE", 20))
+KNOWLEDGE_DB_MAX_OVERFLOW = int(os.environ.get("KNOWLEDGE_DB_MAX_OVERFLOW", 10))
+# Dimenzija vektorjev (pgvector halfvec) v bazi znanja
+KNOWLEDGE_EMBEDDING_DIMENSIONS = int(os.environ.get("KNOWLEDGE_EMBEDDING_DIMENSIONS", 1536))
+
 if not DATABASE_URL:
     DEFAULT_SQLITE_PATH_STR = str(DEFAULT_SQLITE_PATH)
     DATABASE_URL = f"sqlite+aiosqlite:///{DEFAULT_SQLITE_PATH_STR}"
@@ -131,6 +137,9 @@ DEFAULT_MUNICIPALITY_NAME = os.environ.get("KNOWLEDGE_DEFAULT_MUNICIPALITY_NAME"
 TEMP_STORAGE_PATH = DATA_DIR / "temp_sessions"
 TEMP_STORAGE_PATH.mkdir(exist_ok=True)
 
+# Največje število slik, ki se hkrati kodirajo in zapisujejo na disk
+TEMP_IMG_CONCURRENCY = max(1, int(os.environ.get("TEMP_IMG_CONCURRENCY", 8)))
+
 # ==========================================
 # GURS API NASTAVITVE
 # ==========================================
@@ -318,7 +327,8 @@ if ENABLE_GURS_MAP:
 
 __all__ = [
     "API_KEY", "FAST_MODEL_NAME", "POWERFUL_MODEL_NAME", "GEN_CFG", "GEMINI_ANALYSIS_CONCURRENCY",
-    "DATABASE_URL", "DEFAULT_SQLITE_PATH",
+    "DATABASE_URL", "DEFAULT_SQLITE_PATH", "KNOWLEDGE_DB_POOL_SIZE", "KNOWLEDGE_DB_MAX_OVERFLOW",
+    "KNOWLEDGE_EMBEDDING_DIMENSIONS",
     "DEFAULT_MUNICIPALITY_SLUG", "DEFAULT_MUNICIPALITY_NAME",
     "PROJECT_ROOT", "DATA_DIR", "TEMP_STORAGE_PATH",
     "GURS_API_KEY", "GURS_WMS_URL", "GURS_RASTER_WMS_URL", "GURS_RPE_WMS_URL",
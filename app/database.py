@@ -2,11 +2,14 @@
 
 from __future__ import annotations
 
+import asyncio
 import json
+from contextlib import asynccontextmanager
 from datetime import datetime
-from typing import Any, Dict, List, Optional
+from typing import Any, AsyncIterator, Dict, List, Optional
 
 import aiosqlite
+import orjson
 
 from .config import DEFAULT_SQLITE_PATH
 
@@ -19,7 +22,14 @@ def compute_session_summary(data: Dict[str, Any]) -> str:
             return "Analiza še ni bila izvedena."
         
         total = len(results)
-        neskladnih = sum(1 for res in results.values() if "nesklad" in str(res.get("skladnost", "")).lower())
+        neskladnih = 0
+        for res in results.values():
+            status = res.get("skladnost") or ""
+            # str() le za ne-nize; običajno je skladnost že niz
+            if type(status) is not str:
+                status = str(status)
+            if "nesklad" in status.lower():
+                neskladnih += 1
 
         if neskladnih > 0:
             return f"Ugotovljenih {neskladnih} od {total} neskladnih zahtev."
@@ -33,20 +43,61 @@ class DatabaseManager:
 
     def __init__(self, db_path: str | None = None):
         self.db_path = str(db_path or DEFAULT_SQLITE_PATH)
+        self._conn: Optional[aiosqlite.Connection] = None
+        self._conn_lock = asyncio.Lock()
+        # Vse korutine si delijo eno povezavo in s tem eno transakcijo, zato
+        # vsako operacijo (execute ... commit) izvedemo v celoti pod to ključavnico
+        self._op_lock = asyncio.Lock()
+
+    async def _get_conn(self) -> aiosqlite.Connection:
+        """Vrne skupno, dolgoživo povezavo z bazo (ob prvem klicu jo odpre)."""
+        if self._conn is not None:
+            return self._conn
+        async with self._conn_lock:
+            if self._conn is None:
+                db = await aiosqlite.connect(self.db_path)
+                db.row_factory = aiosqlite.Row
+                # PRAGMA nastavitve veljajo za povezavo, zato jih nastavimo le enkrat.
+                # WAL omogoča branje med pisanjem, NORMAL pa v WAL načinu ne izgubi konsistence.
+                await db.execute("PRAGMA journal_mode=WAL;")
+                await db.execute("PRAGMA synchronous=NORMAL;")
+                await db.execute("PRAGMA temp_store=MEMORY;")
+                await db.execute("PRAGMA mmap_size=268435456;")
+                self._conn = db
+        return self._conn
+
+    @asynccontextmanager
+    async def _reading(self) -> AsyncIterator[aiosqlite.Connection]:
+        """Branje na skupni povezavi, ki ne vidi napol opravljenega pisanja druge korutine."""
+        db = await self._get_conn()
+        async with self._op_lock:
+            yield db
+
+    @asynccontextmanager
+    async def _transaction(self) -> AsyncIterator[aiosqlite.Connection]:
+        """Pisanje kot samostojna enota: commit ob uspehu, rollback ob napaki."""
+        db = await self._get_conn()
+        async with self._op_lock:
+            try:
+                yield db
+            except BaseException:
+                await db.rollback()
+                raise
+            await db.commit()
 
-    def _get_connection(self) -> aiosqlite.Connection:
-        """Pripravi asinhrono povezavo z bazo."""
-        # Vrača coroutine, ki ga bo `async with` pravilno obravnaval
-        return aiosqlite.connect(self.db_path)
+    async def close(self):
+        """Zapre skupno povezavo (ob zaustavitvi aplikacije)."""
+        async with self._conn_lock:
+            if self._conn is not None:
+                await self._conn.close()
+                self._conn = None
 
     async def init_db(self):
         """Inicializira shemo baze podatkov, če tabele ne obstajajo."""
-        # SPREMEMBA: Odstranjen `await` pred klicem `self._get_connection()`
-        async with self._get_connection() as db:
-            db.row_factory = aiosqlite.Row
+        async with self._transaction() as db:
             await db.execute("""
                 CREATE TABLE IF NOT EXISTS sessions (
-                    session_id TEXT PRIMARY KEY, project_name TEXT, summary TEXT, data JSON,
+                    session_id TEXT PRIMARY KEY, project_name TEXT, summary TEXT, data BLOB,
                     created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP, updated_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
                 );
             """)
@@ -58,6 +109,22 @@ class DatabaseManager:
                     FOREIGN KEY (session_id) REFERENCES sessions (session_id) ON DELETE CASCADE
                 );
             """)
+            # Indeksa za seznam sej (ORDER BY updated_at) in popravke posamezne seje;
+            # drugi pokrije tudi brisanje po session_id.
+            await db.execute("CREATE INDEX IF NOT EXISTS idx_sessions_updated ON sessions(updated_at DESC);")
+            await db.execute(
+                "CREATE INDEX IF NOT EXISTS idx_revisions_session_uploaded ON revisions(session_id, uploaded_at DESC);"
+            )
+            # Kaskadno brisanje popravkov izvede SQLite sam ob brisanju seje. Namesto
+            # PRAGMA foreign_keys=ON uporabimo sprožilec, ker se popravki lahko
+            # zabeležijo tudi za seje, ki (še) niso shranjene v tabeli sessions.
+            await db.execute("""
+                CREATE TRIGGER IF NOT EXISTS trg_sessions_delete_revisions
+                AFTER DELETE ON sessions
+                BEGIN
+                    DELETE FROM revisions WHERE session_id = OLD.session_id;
+                END;
+            """)
             await db.execute("""
                 CREATE TABLE IF NOT EXISTS map_states (
                     session_id TEXT PRIMARY KEY,
@@ -67,12 +134,10 @@ class DatabaseManager:
                     updated_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
                 );
             """)
-            await db.commit()
 
     async def upsert_session(self, session_id: str, project_name: str, summary: str, data: Dict[str, Any]):
         """Shrani ali posodobi sejo v bazi."""
-        # SPREMEMBA: Odstranjen `await`
-        async with self._get_connection() as db:
+        async with self._transaction() as db:
             await db.execute(
                 """
                 INSERT INTO sessions (session_id, project_name, summary, data, updated_at)
@@ -81,42 +146,38 @@ class DatabaseManager:
                     project_name=excluded.project_name, summary=excluded.summary,
                     data=excluded.data, updated_at=excluded.updated_at;
                 """,
-                (session_id, project_name, summary, json.dumps(data), datetime.utcnow()),
+                (session_id, project_name, summary, orjson.dumps(data, option=orjson.OPT_NON_STR_KEYS), datetime.utcnow()),
             )
-            await db.commit()
 
     async def fetch_sessions(self) -> List[aiosqlite.Row]:
         """Pridobi vse shranjene seje, najnovejše najprej."""
-        # SPREMEMBA: Odstranjen `await`
-        async with self._get_connection() as db:
-            db.row_factory = aiosqlite.Row
-            cursor = await db.execute("SELECT session_id, project_name, summary, updated_at FROM sessions ORDER BY updated_at DESC")
-            return await cursor.fetchall()
+        async with self._reading() as db:
+            async with db.execute(
+                "SELECT session_id, project_name, summary, updated_at FROM sessions ORDER BY updated_at DESC"
+            ) as cursor:
+                return await cursor.fetchall()
 
     async def fetch_session(self, session_id: str) -> Optional[Dict]:
         """Pridobi eno sejo po njenem ID-ju."""
-        # SPREMEMBA: Odstranjen `await`
-        async with self._get_connection() as db:
-            db.row_factory = aiosqlite.Row
-            cursor = await db.execute("SELECT * FROM sessions WHERE session_id = ?", (session_id,))
-            record = await cursor.fetchone()
-            if record:
-                data_dict = dict(record)
-                data_dict['data'] = json.loads(data_dict['data'])
-                return data_dict
-            return None
+        async with self._reading() as db:
+            async with db.execute("SELECT * FROM sessions WHERE session_id = ?", (session_id,)) as cursor:
+                record = await cursor.fetchone()
+        if record:
+            data_dict = dict(record)
+            # orjson.loads sprejme tako nove BLOB zapise kot starejše JSON TEXT vrstice
+            data_dict['data'] = orjson.loads(data_dict['data'])
+            return data_dict
+        return None
 
     async def delete_session(self, session_id: str):
         """Izbriše sejo in vse povezane popravke iz baze."""
-        # SPREMEMBA: Odstranjen `await`
-        async with self._get_connection() as db:
+        async with self._transaction() as db:
+            # Popravke odstrani sprožilec trg_sessions_delete_revisions v isti transakciji
             await db.execute("DELETE FROM sessions WHERE session_id = ?", (session_id,))
-            await db.execute("DELETE FROM revisions WHERE session_id = ?", (session_id,))
-            await db.commit()
 
     async def save_map_state(self, session_id: str, center_lon: float, center_lat: float, zoom: int):
         """Shrani ali posodobi zadnjo lokacijo zemljevida za sejo."""
-        async with self._get_connection() as db:
+        async with self._transaction() as db:
             await db.execute(
                 """
                 INSERT INTO map_states (session_id, center_lon, center_lat, zoom, updated_at)
@@ -129,31 +190,28 @@ class DatabaseManager:
                 """,
                 (session_id, center_lon, center_lat, zoom, datetime.utcnow()),
             )
-            await db.commit()
 
     async def fetch_map_state(self, session_id: str) -> Optional[Dict[str, Any]]:
         """Vrne shranjeno lokacijo zemljevida za sejo, če obstaja."""
-        async with self._get_connection() as db:
-            db.row_factory = aiosqlite.Row
-            cursor = await db.execute(
+        async with self._reading() as db:
+            async with db.execute(
                 "SELECT center_lon, center_lat, zoom, updated_at FROM map_states WHERE session_id = ?",
                 (session_id,),
-            )
-            row = await cursor.fetchone()
-            if row:
-                return {
-                    "center_lon": row["center_lon"],
-                    "center_lat": row["center_lat"],
-                    "zoom": row["zoom"],
-                    "updated_at": row["updated_at"],
-                }
-            return None
+            ) as cursor:
+                row = await cursor.fetchone()
+        if row:
+            return {
+                "center_lon": row["center_lon"],
+                "center_lat": row["center_lat"],
+                "zoom": row["zoom"],
+                "updated_at": row["updated_at"],
+            }
+        return None
 
     async def record_revision(self, session_id: str, filenames: List[str], file_paths: List[str], requirement_id: str | None = None, note: str | None = None, mime_types: List[str] | None = None) -> Dict:
         """Zabeleži nov popravek v bazo."""
         uploaded_at = datetime.utcnow()
-        # SPREMEMBA: Odstranjen `await`
-        async with self._get_connection() as db:
+        async with self._transaction() as db:
             await db.execute(
                 """
                 INSERT INTO revisions (session_id, requirement_id, note, filenames, file_paths, mime_types, uploaded_at)
@@ -161,23 +219,22 @@ class DatabaseManager:
                 """,
                 (session_id, requirement_id, note, json.dumps(filenames), json.dumps(file_paths), json.dumps(mime_types or []), uploaded_at),
             )
-            await db.commit()
         return {"uploaded_at": uploaded_at.isoformat()}
     
     async def fetch_revisions(self, session_id: str) -> List[Dict]:
         """Pridobi vse popravke za določeno sejo."""
-        # SPREMEMBA: Odstranjen `await`
-        async with self._get_connection() as db:
-            db.row_factory = aiosqlite.Row
-            cursor = await db.execute("SELECT * FROM revisions WHERE session_id = ? ORDER BY uploaded_at DESC", (session_id,))
-            rows = await cursor.fetchall()
-            results = []
-            for row in rows:
-                data = dict(row)
-                data['filenames'] = json.loads(data.get('filenames', '[]'))
-                data['file_paths'] = json.loads(data.get('file_paths', '[]'))
-                results.append(data)
-            return results
+        async with self._reading() as db:
+            async with db.execute(
+                "SELECT * FROM revisions WHERE session_id = ? ORDER BY uploaded_at DESC", (session_id,)
+            ) as cursor:
+                rows = await cursor.fetchall()
+        results = []
+        for row in rows:
+            data = dict(row)
+            data['filenames'] = json.loads(data.get('filenames', '[]'))
+            data['file_paths'] = json.loads(data.get('file_paths', '[]'))
+            results.append(data)
+        return results
 
 
 # Ustvarimo eno samo instanco, ki jo bo uporabljala celotna aplikacija.
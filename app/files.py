@@ -1,6 +1,7 @@
 """File-system helpers for storing uploaded revisions."""
 from __future__ import annotations
 
+import asyncio
 import os
 import re
 import shutil
@@ -15,10 +16,12 @@ from typing import (
     BinaryIO,
     Iterable,
     List,
+    Set,
     Tuple,
     Union,
 )
 
+import aiofiles
 from fastapi import UploadFile
 
 from .config import DATA_DIR
@@ -28,6 +31,10 @@ REVISION_ROOT.mkdir(parents=True, exist_ok=True)
 
 SAFE_NAME_RE = re.compile(r"[^A-Za-z0-9_.-]+")
 
+# Največ hkratnih zapisov datotek revizije in velikost bloka pri kopiranju
+REVISION_WRITE_CONCURRENCY = 16
+WRITE_CHUNK_SIZE = 64 * 1024
+
 # --- DODANO: Manjkajoča definicija tipa ---
 ContentType = Union[bytes, Path, BinaryIO, Any]
 
@@ -45,12 +52,12 @@ def sanitize_filename(filename: str) -> str:
 
 
 # --- POPRAVLJENO: Odstranjen diff marker in rekonstruirana funkcija ---
-def save_revision_files(
+async def save_revision_files(
     session_id: str,
     files: List[Tuple[str, ContentType, str]],
     requirement_id: str | None = None,
 ) -> Tuple[List[str], List[str], List[str]]:
-    """Shrani datoteke revizije v namensko mapo."""
+    """Shrani datoteke revizije v namensko mapo (zapisi tečejo vzporedno)."""
 
     # Manjkajoče vrstice, rekonstruirane iz konteksta
     target_dir = REVISION_ROOT / _sanitize_path_component(session_id, "s")
@@ -58,33 +65,64 @@ def save_revision_files(
         target_dir = target_dir / _sanitize_path_component(requirement_id, "r")
     target_dir.mkdir(parents=True, exist_ok=True)
     timestamp = datetime.utcnow().strftime("%Y%m%d%HM%S")
+    # Predpona, mapa in dolžina DATA_DIR se izračunajo enkrat za vse datoteke
+    prefix = f"{timestamp}_"
+    target_dir_str = str(target_dir)
+    data_dir_len = len(str(DATA_DIR)) + 1
 
     filenames: List[str] = []
     file_paths: List[str] = []
     mime_types: List[str] = []
+    writes = []
+    semaphore = asyncio.Semaphore(REVISION_WRITE_CONCURRENCY)
+
+    async def _bounded_write(destination: str, content: ContentType) -> None:
+        async with semaphore:
+            await _write_content(destination, content)
+
+    # Zapisi tečejo vzporedno, zato mora imeti vsaka datoteka v paketu svojo pot;
+    # ponovljeno ime (npr. dva "revizija.pdf" iz različnih map) dobi pripono _n
+    used_names: Set[str] = set()
 
     for original_name, content, mime in files:
         safe_name = sanitize_filename(original_name)
-        stored_name = f"{timestamp}_{safe_name}"
-        destination = target_dir / stored_name
-        _write_content(destination, content)
+        file_name = prefix + safe_name
+        if file_name in used_names:
+            stem, ext = os.path.splitext(safe_name)
+            counter = 1
+            while f"{prefix}{stem}_{counter}{ext}" in used_names:
+                counter += 1
+            file_name = f"{prefix}{stem}_{counter}{ext}"
+        used_names.add(file_name)
+        destination = os.path.join(target_dir_str, file_name)
+        writes.append(_bounded_write(destination, content))
         filenames.append(original_name or safe_name)
-        file_paths.append(str(destination.relative_to(DATA_DIR)))
+        # target_dir je vedno znotraj DATA_DIR, zato relativno pot dobimo z rezom
+        file_paths.append(destination[data_dir_len:])
         mime_types.append(mime or "application/octet-stream")
+
+    await asyncio.gather(*writes)
     return filenames, file_paths, mime_types
 
 
-def _write_content(destination: Path, content: ContentType) -> None:
+def _copy_fileobj(content: BinaryIO, destination: Union[str, Path]) -> None:
+    # Kopiramo po blokih, da velike datoteke niso v celoti v pomnilniku
+    if hasattr(content, "seek"):
+        content.seek(0)
+    with open(destination, "wb") as out_file:
+        shutil.copyfileobj(content, out_file, WRITE_CHUNK_SIZE)
+
+
+async def _write_content(destination: Union[str, Path], content: ContentType) -> None:
     if isinstance(content, bytes):
-        destination.write_bytes(content)
+        async with aiofiles.open(destination, "wb") as out_file:
+            await out_file.write(content)
     elif isinstance(content, Path):
-        shutil.copyfile(content, destination)
+        # copyfile uporablja sendfile/copy_file_range, zato ga le umaknemo z zanke dogodkov
+        await asyncio.to_thread(shutil.copyfile, content, destination)
     elif hasattr(content, "read"):
-        # Prepričajmo se, da gre za binarno branje
-        with destination.open("wb") as out_file:
-            if hasattr(content, "seek"):
-                content.seek(0)
-            shutil.copyfileobj(content, out_file)
+        # Branje datotečnega objekta je sinhrono, zato celotno kopiranje izvedemo v niti
+        await asyncio.to_thread(_copy_fileobj, content, destination)
     else:
         raise TypeError("Nepodprta vrsta vsebine pri shranjevanju datoteke.")
 
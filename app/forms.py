@@ -1,23 +1,38 @@
 """Generation of filled-in Excel forms (Priloga 10A)."""
 from __future__ import annotations
 
+import asyncio
 from datetime import datetime
+from functools import lru_cache
+from io import BytesIO
 from pathlib import Path
-from typing import Any, Dict, Iterable, List, Optional
-
-try:  # pragma: no cover - optional dependency import guard
-    from openpyxl import load_workbook
-    from openpyxl.utils.cell import coordinate_to_tuple
-    from openpyxl.styles import Alignment, Font
-except ImportError as exc:  # pragma: no cover - import guard
-    raise RuntimeError(
-        "Knjižnica 'openpyxl' ni nameščena. Namestite jo z `pip install openpyxl`."
-    ) from exc
+from typing import TYPE_CHECKING, Any, Dict, Iterable, Iterator, List, Optional, Tuple
 
 from .config import PROJECT_ROOT
 
+if TYPE_CHECKING:  # pragma: no cover - samo za oznake tipov
+    from openpyxl.styles import Alignment
+
+# openpyxl uvozimo lokalno v funkcijah, ki ga potrebujejo: uvoz upočasni zagon
+# procesa, obrazec pa se generira redko. Ponovni uvoz je le iskanje v sys.modules.
+
 TEMPLATE_PATH = PROJECT_ROOT / "Priloga10A.xlsx"
 
+
+@lru_cache(maxsize=1)
+def _read_template_bytes(mtime_ns: int) -> bytes:
+    return TEMPLATE_PATH.read_bytes()
+
+
+def _template_bytes() -> Optional[bytes]:
+    """Vrne vsebino predloge iz pomnilnika; ob spremembi datoteke (mtime) jo ponovno prebere."""
+    try:
+        mtime_ns = TEMPLATE_PATH.stat().st_mtime_ns
+    except FileNotFoundError:
+        return None
+    return _read_template_bytes(mtime_ns)
+
+
 KEY_DATA_LABELS = [
     ("glavni_objekt", "Glavni objekt"),
     ("vrsta_gradnje", "Vrsta gradnje"),
@@ -44,7 +59,10 @@ KEY_DATA_LABELS = [
 def _clean(value: Any, fallback: str = "Ni podatka") -> str:
     if value is None:
         return fallback
-    if isinstance(value, str):
+    if type(value) is str:
+        # Pogost primer: niz brez robnih presledkov vrnemo brez nove kopije
+        if value and not (value[0].isspace() or value[-1].isspace()):
+            return value
         text = value.strip()
     else:
         text = str(value).strip()
@@ -60,59 +78,60 @@ def _format_key_data(key_data: Dict[str, Any]) -> str:
     return "\n".join(lines) or "Ni potrjenih ključnih podatkov iz projekta."
 
 
-def _format_predpis(zahteve: Iterable[Dict[str, Any]]) -> str:
-    seen: List[str] = []
-    for zahteva in zahteve:
-        naslov = _clean(zahteva.get("naslov", ""), "")
-        if naslov and naslov not in seen:
-            seen.append(naslov)
-    if not seen:
+def _format_predpis(naslovi: List[str]) -> str:
+    if not naslovi:
         return "Ni evidentiranih pravnih podlag."
-    return "\n".join(seen)
+    return "\n".join(naslovi)
 
 
 def _format_obrazlozitev(
     total: int, non_compliant: List[str], compliant: List[str], key_data_text: str
 ) -> str:
-    lines = [
-        f"Analiziranih pogojev: {total}",
-        f"Neskladnih pogojev: {len(non_compliant)}",
-        f"Skladnih pogojev: {len(compliant)}",
-    ]
-
-    if non_compliant:
-        lines.append("")
-        lines.append("Neskladni členi:")
-        lines.extend([f"  • {item}" for item in non_compliant])
-
-    if compliant:
-        lines.append("")
-        lines.append("Skladni členi:")
-        lines.extend([f"  • {item}" for item in compliant])
-
-    cleaned_key_data = key_data_text.strip()
-    if cleaned_key_data:
-        lines.append("")
-        lines.append("Ključni podatki projekta:")
-        lines.append(cleaned_key_data)
-
-    return "\n".join(lines)
-
-
-def _summarize_results(zahteve: Iterable[Dict[str, Any]], results_map: Dict[str, Dict[str, Any]]):
+    def _iter_lines() -> Iterator[str]:
+        yield f"Analiziranih pogojev: {total}"
+        yield f"Neskladnih pogojev: {len(non_compliant)}"
+        yield f"Skladnih pogojev: {len(compliant)}"
+
+        if non_compliant:
+            yield ""
+            yield "Neskladni členi:"
+            yield from (f"  • {item}" for item in non_compliant)
+
+        if compliant:
+            yield ""
+            yield "Skladni členi:"
+            yield from (f"  • {item}" for item in compliant)
+
+        cleaned_key_data = key_data_text.strip()
+        if cleaned_key_data:
+            yield ""
+            yield "Ključni podatki projekta:"
+            yield cleaned_key_data
+
+    return "\n".join(_iter_lines())
+
+
+def _analyze(
+    zahteve: Iterable[Dict[str, Any]], results_map: Dict[str, Dict[str, Any]]
+) -> Tuple[List[str], List[str], List[str]]:
+    """En prehod čez zahteve: unikatni naslovi (pravne podlage), skladne in neskladne vrstice."""
+    naslovi: Dict[str, None] = {}
     compliant: List[str] = []
     non_compliant: List[str] = []
     for zahteva in zahteve:
+        naslov = _clean(zahteva.get("naslov", ""), "")
+        if naslov:
+            naslovi[naslov] = None
         zid = zahteva.get("id")
         result = results_map.get(zid, {}) if zid else {}
         status = _clean(result.get("skladnost", "Neznano"))
-        naslov = _clean(zahteva.get("naslov", "Zahteva"))
-        line = f"{naslov} – {status}"
+        # Prazen naslov: ohranimo prejšnje privzete vrednosti ("Zahteva" / "Ni podatka")
+        line = f"{naslov or _clean(zahteva.get('naslov', 'Zahteva'))} – {status}"
         if "nesklad" in status.lower():
             non_compliant.append(line)
         else:
             compliant.append(line)
-    return compliant, non_compliant
+    return list(naslovi), compliant, non_compliant
 
 
 def _format_source_files(source_files: Iterable[Dict[str, Any]]) -> str:
@@ -172,6 +191,8 @@ def _collect_alignment_kwargs(alignment: Alignment, *, camel_case: bool) -> Dict
 
 
 def _build_wrapped_alignment(alignment: Optional[Alignment]) -> Alignment:
+    from openpyxl.styles import Alignment
+
     if alignment is None:
         for wrap_key in ("wrapText", "wrap_text"):
             try:
@@ -208,6 +229,8 @@ def _apply_wrap_text(cell) -> None:
 
 
 def _apply_text_format(cell) -> None:
+    from openpyxl.styles import Font
+
     _apply_wrap_text(cell)
     current_font = getattr(cell, "font", None)
     if current_font is not None:
@@ -219,31 +242,58 @@ def _apply_text_format(cell) -> None:
     cell.font = Font(color=BLACK_FONT_COLOR)
 
 
-def _set_cell_value(worksheet, cell: str, value: Any) -> None:
-    try:
-        target = worksheet[cell]
-        target.value = value
-        _apply_text_format(target)
-        return
-    except AttributeError as exc:
-        if "MergedCell" not in str(exc):
-            raise
-
-        row, column = coordinate_to_tuple(cell)
-        for merged_range in worksheet.merged_cells.ranges:
-            if (
-                merged_range.min_row <= row <= merged_range.max_row
-                and merged_range.min_col <= column <= merged_range.max_col
-            ):
-                base_cell = worksheet.cell(
-                    row=merged_range.min_row, column=merged_range.min_col
-                )
-                base_cell.value = value
-                _apply_text_format(base_cell)
-                return
-
-        # If the cell is not part of a merged range re-raise the original error.
-        raise exc
+MergedIndex = Dict[Tuple[int, int], Tuple[int, int]]
+
+_SAVE_BUFFER_SIZE = 1 << 20
+
+# Izhodne mape, ki smo jih v tem procesu že ustvarili. Če mapo kdo vmes izbriše,
+# napako javi workbook.save.
+_MKDIR_CACHE: set[Path] = set()
+
+# Koordinate celic predloge, ki jih polnimo; razčleni jih _cell_coords ob prvem klicu
+_CELL_NAMES = (
+    "C4", "C7", "C9", "C10", "C11", "C12", "C14",
+    "C34", "C35", "C37", "C38", "C39", "C40",
+    "C47", "B48", "B49", "C52", "C53", "C54", "C57", "C62",
+)
+
+
+@lru_cache(maxsize=1)
+def _cell_coords() -> Dict[str, Tuple[int, int]]:
+    from openpyxl.utils.cell import coordinate_to_tuple
+
+    return {cell: coordinate_to_tuple(cell) for cell in _CELL_NAMES}
+
+
+def _build_merged_index(worksheet) -> MergedIndex:
+    """Preslika vsako celico združenega območja v njegovo zgornjo levo celico."""
+    index: MergedIndex = {}
+    # Seznam območij preberemo enkrat; meje vsakega območja razpakiramo v lokalne spremenljivke
+    merged_ranges = list(worksheet.merged_cells.ranges)
+    for merged_range in merged_ranges:
+        min_col, min_row, max_col, max_row = merged_range.bounds
+        anchor = (min_row, min_col)
+        columns = range(min_col, max_col + 1)
+        for row in range(min_row, max_row + 1):
+            for column in columns:
+                index[(row, column)] = anchor
+    return index
+
+
+def _resolve_anchor(merged_index: MergedIndex, cell: str) -> Tuple[int, int]:
+    """Vrne (vrstica, stolpec) celice; za združena območja njihovo zgornjo levo celico."""
+    coords = _cell_coords().get(cell)
+    if coords is None:
+        from openpyxl.utils.cell import coordinate_to_tuple
+
+        coords = coordinate_to_tuple(cell)
+    return merged_index.get(coords, coords)
+
+
+def _write_cell(worksheet, row: int, column: int, value: Any) -> None:
+    target = worksheet.cell(row=row, column=column)
+    target.value = value
+    _apply_text_format(target)
 
 
 def generate_priloga_10a(
@@ -254,66 +304,94 @@ def generate_priloga_10a(
     source_files: Iterable[Dict[str, Any]],
     output_path: str,
 ) -> str:
-    if not TEMPLATE_PATH.exists():
+    try:  # pragma: no cover - optional dependency import guard
+        from openpyxl import load_workbook
+    except ImportError as exc:  # pragma: no cover - import guard
+        raise RuntimeError(
+            "Knjižnica 'openpyxl' ni nameščena. Namestite jo z `pip install openpyxl`."
+        ) from exc
+
+    template_bytes = _template_bytes()
+    if template_bytes is None:
         raise FileNotFoundError(f"Manjka predloga Priloga10A.xlsx na poti: {TEMPLATE_PATH}")
 
-    workbook = load_workbook(TEMPLATE_PATH)
+    workbook = load_workbook(BytesIO(template_bytes))
     worksheet = workbook.active
 
+    merged_index = _build_merged_index(worksheet)
+
     project_name = _clean(metadata.get("ime_projekta", "Ni podatka"))
-    _set_cell_value(
-        worksheet,
-        "C4",
-        f"Mnenje o skladnosti – {project_name}" if project_name else "Mnenje o skladnosti",
-    )
-    _set_cell_value(worksheet, "C7", _clean(metadata.get("mnenjedajalec", "Avtomatski pregled skladnosti")))
-    _set_cell_value(worksheet, "C9", _clean(metadata.get("stevilka_porocila", "Ni podatka")))
-    _set_cell_value(worksheet, "C10", datetime.now().strftime("%d.%m.%Y"))
+    naslovi, compliant, non_compliant = _analyze(zahteve, results_map)
     predpisi_text = _clean(metadata.get("predpisi", ""), "")
-    _set_cell_value(
-        worksheet,
-        "C11",
-        predpisi_text if predpisi_text else _format_predpis(zahteve),
-    )
-    _set_cell_value(worksheet, "C12", _clean(metadata.get("postopek_vodil", "Ni podatka")))
-    _set_cell_value(worksheet, "C14", _clean(metadata.get("odgovorna_oseba", "Ni podatka")))
-
-    _set_cell_value(worksheet, "C34", project_name)
-    _set_cell_value(
-        worksheet,
-        "C35",
-        _clean(metadata.get("kratek_opis", key_data.get("vrsta_gradnje", "Ni podatka"))),
-    )
-    _set_cell_value(worksheet, "C37", _clean(metadata.get("stevilka_projekta", "Ni podatka")))
-    _set_cell_value(worksheet, "C38", _clean(metadata.get("datum_projekta", "Ni podatka")))
-    _set_cell_value(worksheet, "C39", _clean(metadata.get("projektant", "Ni podatka")))
-
-    _set_cell_value(worksheet, "C47", _format_source_files(source_files))
-
-    compliant, non_compliant = _summarize_results(zahteve, results_map)
     total = len(zahteve)
     overall_skladnost = "SKLADNA" if not non_compliant else "NESKLADNA"
-    _set_cell_value(worksheet, "B48", "X" if overall_skladnost == "SKLADNA" else "")
-    _set_cell_value(worksheet, "B49", "X" if overall_skladnost == "NESKLADNA" else "")
-
-    _set_cell_value(worksheet, "C52", "")
-    _set_cell_value(worksheet, "C53", "")
-    _set_cell_value(worksheet, "C54", "")
-
     key_data_text = _format_key_data(key_data)
     obrazlozitev_text = _format_obrazlozitev(total, non_compliant, compliant, key_data_text)
-    _set_cell_value(worksheet, "C57", obrazlozitev_text)
-    _set_cell_value(
-        worksheet,
-        "C62",
-        f"Gradnja je {overall_skladnost.lower()} glede na preverjene pogoje." if total else "Analiza pogojev ni bila izvedena."
-    )
-    _set_cell_value(worksheet, "C40", _clean(metadata.get("pvo_status", "Ni podatka")))
+
+    # Najprej izračunamo vse vrednosti, nato jih zapišemo v eni zanki
+    cell_values: List[Tuple[str, Any]] = [
+        ("C4", f"Mnenje o skladnosti – {project_name}" if project_name else "Mnenje o skladnosti"),
+        ("C7", _clean(metadata.get("mnenjedajalec", "Avtomatski pregled skladnosti"))),
+        ("C9", _clean(metadata.get("stevilka_porocila", "Ni podatka"))),
+        ("C10", datetime.now().strftime("%d.%m.%Y")),
+        ("C11", predpisi_text if predpisi_text else _format_predpis(naslovi)),
+        ("C12", _clean(metadata.get("postopek_vodil", "Ni podatka"))),
+        ("C14", _clean(metadata.get("odgovorna_oseba", "Ni podatka"))),
+        ("C34", project_name),
+        ("C35", _clean(metadata.get("kratek_opis", key_data.get("vrsta_gradnje", "Ni podatka")))),
+        ("C37", _clean(metadata.get("stevilka_projekta", "Ni podatka"))),
+        ("C38", _clean(metadata.get("datum_projekta", "Ni podatka"))),
+        ("C39", _clean(metadata.get("projektant", "Ni podatka"))),
+        ("C47", _format_source_files(source_files)),
+        ("B48", "X" if overall_skladnost == "SKLADNA" else ""),
+        ("B49", "X" if overall_skladnost == "NESKLADNA" else ""),
+        ("C52", ""),
+        ("C53", ""),
+        ("C54", ""),
+        ("C57", obrazlozitev_text),
+        (
+            "C62",
+            f"Gradnja je {overall_skladnost.lower()} glede na preverjene pogoje." if total else "Analiza pogojev ni bila izvedena.",
+        ),
+        ("C40", _clean(metadata.get("pvo_status", "Ni podatka"))),
+    ]
+    # Več naslovov (npr. C52–C54) lahko pade v isto združeno območje; vsako
+    # osnovno celico zapišemo le enkrat, z zadnjo vrednostjo kot doslej.
+    anchor_values: Dict[Tuple[int, int], Any] = {}
+    for cell, value in cell_values:
+        anchor_values[_resolve_anchor(merged_index, cell)] = value
+    for (row, column), value in anchor_values.items():
+        _write_cell(worksheet, row, column, value)
 
     output_file = Path(output_path)
-    output_file.parent.mkdir(parents=True, exist_ok=True)
-    workbook.save(output_file)
+    output_dir = output_file.parent
+    if output_dir not in _MKDIR_CACHE:
+        output_dir.mkdir(parents=True, exist_ok=True)
+        _MKDIR_CACHE.add(output_dir)
+    # XLSX je ZIP z veliko majhnimi zapisi; večji medpomnilnik jih združi v manj sistemskih klicev
+    with open(output_file, "wb", buffering=_SAVE_BUFFER_SIZE) as handle:
+        workbook.save(handle)
     return str(output_file.resolve())
 
 
-__all__ = ["generate_priloga_10a"]
+async def generate_priloga_10a_async(
+    zahteve: List[Dict[str, Any]],
+    results_map: Dict[str, Dict[str, Any]],
+    metadata: Dict[str, Any],
+    key_data: Dict[str, Any],
+    source_files: Iterable[Dict[str, Any]],
+    output_path: str,
+) -> str:
+    """Asinhrona različica, ki openpyxl delo (polnjenje in zip zapis) izvede v ločeni niti."""
+    return await asyncio.to_thread(
+        generate_priloga_10a,
+        zahteve,
+        results_map,
+        metadata,
+        key_data,
+        source_files,
+        output_path,
+    )
+
+
+__all__ = ["generate_priloga_10a", "generate_priloga_10a_async"]
@@ -1,12 +1,30 @@
 from __future__ import annotations
+import threading
 from datetime import datetime
+from typing import Optional, Tuple
 from .config import PROJECT_ROOT
 
 MODERN_FRONTEND_PATH = PROJECT_ROOT / "app" / "modern_frontend.html"
 
-def build_homepage() -> str:
+# Končni HTML se spremeni le z letnico, zato ga hranimo skupaj z njo
+_RENDERED: Optional[Tuple[int, str]] = None
+_RENDER_LOCK = threading.Lock()
+
+
+def _render(year: int) -> str:
     html = MODERN_FRONTEND_PATH.read_text(encoding="utf-8")
-    html = html.replace("YEAR_PLACEHOLDER", str(datetime.now().year))
-    return html
+    return html.replace("YEAR_PLACEHOLDER", str(year))
+
+
+def build_homepage() -> str:
+    global _RENDERED
+    year = datetime.now().year
+    rendered = _RENDERED
+    if rendered is not None and rendered[0] == year:
+        return rendered[1]
+    with _RENDER_LOCK:
+        if _RENDERED is None or _RENDERED[0] != year:
+            _RENDERED = (year, _render(year))
+        return _RENDERED[1]
 
-__all__ = ["build_homepage"]
\ No newline at end of file
+__all__ = ["build_homepage"]
@@ -1,15 +1,27 @@
 """Loading and working with the local planning knowledge base."""
 from __future__ import annotations
 
+import io
 import json
 import re
+import sys
+from dataclasses import dataclass, field
 from functools import lru_cache
-from typing import Any, Dict, List, Optional, Pattern, Tuple
+from itertools import chain
+from typing import Any, Dict, Iterator, List, Optional, Pattern, Tuple
+
+import orjson
+
+try:  # pragma: no cover - izbirna odvisnost
+    import ahocorasick
+except ImportError:  # pragma: no cover - brez nje uporabimo regularne izraze
+    ahocorasick = None
 
 from .config import DEFAULT_MUNICIPALITY_SLUG
-from .knowledge_store import knowledge_repository
+from .knowledge_store import KnowledgeSearchResult, knowledge_repository
 from .municipalities import get_municipality_profile
 
+
 KEYWORD_TO_CLEN = {
     # Gradnja in objekti
     "gradnj": "52_clen", "dozidava": "52_clen", "nadzidava": "52_clen", "rekonstrukcija": "52_clen",
@@ -55,58 +67,190 @@ KEYWORD_PATTERNS: Dict[str, Pattern[str]] = {
 }
 
 
-def format_structured_content(data_dict: Dict[str, Any]) -> str:
-    lines = []
+def _build_clen_patterns() -> Dict[str, Pattern[str]]:
+    keywords_by_clen: Dict[str, List[str]] = {}
+    for keyword, clen in KEYWORD_TO_CLEN.items():
+        keywords_by_clen.setdefault(clen, []).append(re.escape(keyword))
+    return {
+        clen: re.compile("|".join(keywords), re.IGNORECASE)
+        for clen, keywords in keywords_by_clen.items()
+    }
+
+
+# Ena alternacija na člen: ključne besede se prekrivajo (npr. "FZ"/"FZP",
+# "gradnj"/"razpršena gradnja"), zato jih ne združimo v en sam vzorec.
+_CLEN_PATTERNS = _build_clen_patterns()
+
+# Členi splošnih PIP: 52.–66. so obvezni, ostali le ob ujemanju ključnih besed
+_MANDATORY_CLENS: Tuple[Tuple[int, str], ...] = tuple((i, f"{i}_clen") for i in range(52, 67))
+_OPTIONAL_CLENS: Dict[str, int] = {f"{i}_clen": i for i in range(67, 104)}
+_NASLOV_RE: Pattern[str] = re.compile(r"^\s*\(([^)]+)\)")
+
+_PRILOGA1_HEADER = "\n\n" + "=" * 50
+_PRILOGA1_SECTION_SEP = "\n\n"
+
+
+def _build_keyword_automaton() -> Any:
+    if ahocorasick is None:
+        return None
+    automaton = ahocorasick.Automaton()
+    for keyword, clen in KEYWORD_TO_CLEN.items():
+        automaton.add_word(keyword.lower(), clen)
+    automaton.make_automaton()
+    return automaton
+
+
+# Vse ključne besede poiščemo v enem prehodu čez opis projekta (Aho–Corasick)
+_KEYWORD_AUTOMATON = _build_keyword_automaton()
+
+
+def _find_triggered_cleni(project_text: str) -> set[str]:
+    if _KEYWORD_AUTOMATON is not None:
+        return {clen for _, clen in _KEYWORD_AUTOMATON.iter(project_text.lower())}
+    return {clen for clen, pattern in _CLEN_PATTERNS.items() if pattern.search(project_text)}
+
+# Napotila na druge namenske rabe. Vsak vzorec preiščemo posebej, ker se
+# napotila lahko prekrivajo ("določila za kot pri SS" napoti na KOT in SS),
+# ena sama alternacija pa bi po prvem zadetku preskočila drugega. Daljše fraze
+# ("upoštevajo se pogoji za", "veljajo določila za", ...) se končajo z enim od
+# teh vzorcev, zato jih ni treba iskati posebej.
+_REFERENCE_PATTERNS: Tuple[Pattern[str], ...] = tuple(
+    re.compile(pattern, re.IGNORECASE)
+    for pattern in (
+        r"pogoj[ie]?\s+za\s+([A-Z]{1,3}[a-z]?)\b",
+        r"kot\s+pri\s+([A-Z]{1,3}[a-z]?)\b",
+        r"smiselno\s+velj[a]?[jo]?\s+za\s+([A-Z]{1,3}[a-z]?)\b",
+        r"določila\s+za\s+([A-Z]{1,3}[a-z]?)\b",
+    )
+)
+
+
+@lru_cache(maxsize=512)
+def _pretty_key(key: str) -> str:
+    return key.replace("_", " ").capitalize()
+
+
+@lru_cache(maxsize=512)
+def _sub_key_label(key: str) -> str:
+    return key.replace("_", " ")
+
+
+def _iter_structured_lines(data_dict: Dict[str, Any]) -> Iterator[str]:
     for key, value in data_dict.items():
         if isinstance(value, dict):
-            lines.append(f"\n- {key.replace('_', ' ').capitalize()}:")
+            yield f"\n- {_pretty_key(key)}:"
             for sub_key, sub_value in value.items():
-                lines.append(f"  - {sub_key.replace('_', ' ')}: {sub_value}")
+                yield f"  - {_sub_key_label(sub_key)}: {sub_value}"
         elif isinstance(value, list):
-            lines.append(f"\n- {key.replace('_', ' ').capitalize()}:")
+            yield f"\n- {_pretty_key(key)}:"
             for item in value:
-                lines.append(f"  - {item}")
+                yield f"  - {item}"
         else:
-            lines.append(f"- {key.replace('_', ' ').capitalize()}: {value}")
-    return "\n".join(lines)
+            yield f"- {_pretty_key(key)}: {value}"
+
+
+def format_structured_content(data_dict: Dict[str, Any]) -> str:
+    return "\n".join(_iter_structured_lines(data_dict))
 
 
 def format_uredba_summary(uredba_data: Dict[str, Any]) -> str:
     if not uredba_data:
         return "Podatki iz UredbaObjekti.json niso na voljo."
+    try:
+        return orjson.dumps(
+            uredba_data, option=orjson.OPT_INDENT_2 | orjson.OPT_NON_STR_KEYS
+        ).decode("utf-8")
+    except orjson.JSONEncodeError:
+        pass
     try:
         return json.dumps(uredba_data, ensure_ascii=False, indent=2)
     except Exception:
         return str(uredba_data)
 
 
-@lru_cache(maxsize=4)
-def load_knowledge_base(
+KnowledgeBase = Tuple[Dict, Dict, List, Dict, str, str]
+
+
+@dataclass(slots=True)
+class _KnowledgeIndexes:
+    """Izpeljani podatki ene občine; dokumenti v KnowledgeBase ostanejo nespremenjeni."""
+
+    splosni_naslovi: Dict[str, str]
+    land_uses_normalized: List[str]
+    nrp_conditions_flat: Dict[str, Any]
+    priloga2_by_eup: Dict[str, Dict[str, Any]]
+    # Sprotno polnjeni predpomnilniki (besedilo Priloge 1 po rabi, podrobni pogoji po rabi)
+    priloga1_texts: Dict[str, str] = field(default_factory=dict)
+    podrobni_pogoji: Dict[str, Tuple[str, List[str]]] = field(default_factory=dict)
+
+
+# Naložena baza znanja in njeni indeksi po knowledge_slug občine (en vnos na občino)
+_KB_BY_SLUG: Dict[str, Tuple[KnowledgeBase, _KnowledgeIndexes]] = {}
+
+def load_knowledge_base(municipality_slug: str | None = None) -> KnowledgeBase:
+    return _load_knowledge(municipality_slug)[0]
+
+
+def _load_knowledge(
     municipality_slug: str | None = None,
-) -> Tuple[Dict, Dict, List, Dict, str, str]:
+) -> Tuple[KnowledgeBase, _KnowledgeIndexes]:
     profile = get_municipality_profile(municipality_slug)
     slug = profile.knowledge_slug
-    knowledge_repository.ensure_bootstrap(slug, profile.name)
+    cached = _KB_BY_SLUG.get(slug)
+    if cached is not None:
+        return cached
+    knowledge = _build_knowledge_base(slug, profile.name)
+    loaded = _KB_BY_SLUG[slug] = (knowledge, _index_knowledge_base(knowledge))
+    return loaded
+
+
+def _index_knowledge_base(knowledge: KnowledgeBase) -> _KnowledgeIndexes:
+    opn_katalog, priloge = knowledge[0], knowledge[1]
+    splosni_pogoji = opn_katalog.get("splosni_prostorski_izvedbeni_pogoji")
+    priloga1 = priloge.get("priloga1", {})
+    return _KnowledgeIndexes(
+        splosni_naslovi=(
+            _index_splosni_naslovi(splosni_pogoji) if isinstance(splosni_pogoji, dict) else {}
+        ),
+        land_uses_normalized=_normalize_land_uses(priloga1.get("land_uses", [])),
+        nrp_conditions_flat=_flatten_nrp_conditions(priloga1.get("objects", [])),
+        priloga2_by_eup=_index_priloga2(priloge.get("priloga2", {}).get("table_entries", [])),
+    )
+
 
-    opn_katalog = knowledge_repository.load_document_json(slug, "core", "opn")
+def _build_knowledge_base(slug: str, municipality_name: str) -> KnowledgeBase:
+    knowledge_repository.ensure_bootstrap(slug, municipality_name)
+    return _assemble_knowledge_base(slug)
+
+
+def _assemble_knowledge_base(slug: str) -> KnowledgeBase:
+    # Vse dokumente preberemo v enem poizvedovanju namesto po enega naenkrat
+    documents = knowledge_repository.load_documents(slug)
+
+    def document_json(document_type: str, document_slug: str) -> Any:
+        return documents.get((document_type, document_slug), ({}, ""))[0]
+
+    opn_katalog = document_json("core", "opn")
     if not isinstance(opn_katalog, dict):
         opn_katalog = {}
 
-    clen_data_map: Dict[str, Dict[str, Any]] = {}
-    for cat_key, cat_data in opn_katalog.items():
-        if "clen" in cat_data and "podrocja" in cat_data and isinstance(cat_data["podrocja"], dict):
-            for raba_key, raba_data in cat_data["podrocja"].items():
-                clen_data_map[raba_key.upper()] = {
-                    "title": cat_data.get("naslov", ""),
-                    "podrocje_naziv": raba_data.get("naziv", ""),
-                    "content_structured": raba_data,
-                    "parent_clen_key": f"{cat_data['clen']}_clen",
-                }
-
-    priloga1_data = knowledge_repository.load_document_json(slug, "priloge", "priloga1")
-    priloga2_data = knowledge_repository.load_document_json(slug, "priloge", "priloga2")
-    priloga34_data = knowledge_repository.load_document_json(slug, "priloge", "priloga3-4")
-    izrazi_data_raw = knowledge_repository.load_document_json(slug, "priloge", "izrazi")
+    clen_data_map: Dict[str, Dict[str, Any]] = {
+        sys.intern(raba_key.upper()): {
+            "title": cat_data.get("naslov", ""),
+            "podrocje_naziv": raba_data.get("naziv", ""),
+            "content_structured": raba_data,
+            "parent_clen_key": parent_clen_key,
+        }
+        for cat_data in opn_katalog.values()
+        if "clen" in cat_data and isinstance(cat_data.get("podrocja"), dict)
+        for parent_clen_key in (sys.intern(f"{cat_data['clen']}_clen"),)
+        for raba_key, raba_data in cat_data["podrocja"].items()
+    }
+
+    priloga1_data = document_json("priloge", "priloga1")
+    priloga2_data = document_json("priloge", "priloga2")
+    priloga34_data = document_json("priloge", "priloga3-4")
+    izrazi_data_raw = document_json("priloge", "izrazi")
 
     priloge = {
         "priloga1": priloga1_data if isinstance(priloga1_data, dict) else {},
@@ -119,14 +263,14 @@ def load_knowledge_base(
         priloge["priloga3"] = priloga34_data.get("priloga3", {}) or {}
         priloge["priloga4"] = priloga34_data.get("priloga4", {}) or {}
 
-    all_eups = [
+    eup_set = {
         item.get("enota_urejanja", "")
         for item in priloge.get("priloga2", {}).get("table_entries", [])
-    ]
-    all_eups.extend(
-        [item.get("urejevalna_enota", "") for item in priloge.get("priloga3", {}).get("entries", [])]
+    }
+    eup_set.update(
+        item.get("urejevalna_enota", "") for item in priloge.get("priloga3", {}).get("entries", [])
     )
-    unique_eups = sorted(list(set(filter(None, all_eups))), key=len, reverse=True)
+    unique_eups = sorted(filter(None, eup_set), key=len, reverse=True)
 
     izrazi_data = priloge.get("Izrazi", {})
     izrazi_text = "\n".join([
@@ -134,11 +278,9 @@ def load_knowledge_base(
         for term in izrazi_data.get("terms", [])
     ])
 
-    uredba_text = knowledge_repository.load_document_text(slug, "priloge", "uredba-objekti")
-    if not uredba_text:
-        uredba_json = knowledge_repository.load_document_json(slug, "priloge", "uredba-objekti")
-        if isinstance(uredba_json, dict):
-            uredba_text = format_uredba_summary(uredba_json)
+    uredba_json, uredba_text = documents.get(("priloge", "uredba-objekti"), ({}, ""))
+    if not uredba_text and isinstance(uredba_json, dict):
+        uredba_text = format_uredba_summary(uredba_json)
 
     return opn_katalog, priloge, unique_eups, clen_data_map, izrazi_text, uredba_text
 
@@ -147,54 +289,95 @@ def normalize_eup(eup_str: str) -> str:
     return eup_str.strip().upper() if eup_str else ""
 
 
+def _index_priloga2(entries: List[Dict[str, Any]]) -> Dict[str, Dict[str, Any]]:
+    index: Dict[str, Dict[str, Any]] = {}
+    for entry in entries:
+        index.setdefault(normalize_eup(entry.get("enota_urejanja", "")), entry)
+    return index
+
+
 def extract_referenced_namenske_rabe(
-    content: str, clen_data_map: Optional[Dict[str, Any]] = None
+    content: str,
+    clen_data_map: Optional[Dict[str, Any]] = None,
+    municipality_slug: str | None = None,
 ) -> List[str]:
     if clen_data_map is None:
-        _, _, _, clen_data_map, _, _ = load_knowledge_base()
-    referenced = [
-        m.upper()
-        for pattern in [
-            r"pogoj[ie]?\s+za\s+([A-Z]{1,3}[a-z]?)\b",
-            r"kot\s+pri\s+([A-Z]{1,3}[a-z]?)\b",
-            r"velj[a]?[jo]?\s+določila\s+za\s+([A-Z]{1,3}[a-z]?)\b",
-            r"smiselno\s+velj[a]?[jo]?\s+za\s+([A-Z]{1,3}[a-z]?)\b",
-            r"upoštev[a]?[jo]?\s+se\s+pogoj[ie]?\s+za\s+([A-Z]{1,3}[a-z]?)\b",
-            r"skladno\s+s\s+pogoj[ie]?\s+za\s+([A-Z]{1,3}[a-z]?)\b",
-            r"prevzem[a]?[jo]?\s+določila\s+za\s+([A-Z]{1,3}[a-z]?)\b",
-            r"določila\s+za\s+([A-Z]{1,3}[a-z]?)\b",
-        ]
-        for m in re.findall(pattern, content, re.IGNORECASE)
-    ]
-    return [r for r in set(referenced) if r in clen_data_map]
+        clen_data_map = get_clen_data_map(municipality_slug)
+    referenced = {m.upper() for pattern in _REFERENCE_PATTERNS for m in pattern.findall(content)}
+    return list(referenced & clen_data_map.keys())
+
+
+def _normalize_land_uses(land_uses: List[str]) -> List[str]:
+    """Stolpci Priloge 1 z velikimi črkami in brez presledkov, pripravljeni enkrat."""
+    return [use.upper().replace(" ", "") for use in land_uses]
+
+
+def _flatten_nrp_conditions(objects: List[Dict[str, Any]]) -> Dict[str, Any]:
+    return {k: v for obj in objects for k, v in obj.get("nrp_conditions", {}).items()}
 
 
 def build_priloga1_text(
-    namenska_raba: str, priloge: Optional[Dict[str, Any]] = None
+    namenska_raba: str,
+    priloge: Optional[Dict[str, Any]] = None,
+    municipality_slug: str | None = None,
 ) -> str:
     if priloge is None:
-        _, priloge, _, _, _, _ = load_knowledge_base()
+        knowledge, indexes = _load_knowledge(municipality_slug)
+        return _priloga1_text(namenska_raba, knowledge, indexes)
+    for knowledge, indexes in _KB_BY_SLUG.values():
+        if knowledge[1] is priloge:
+            return _priloga1_text(namenska_raba, knowledge, indexes)
+    # Priloge, ki niso iz naložene baze: izrišemo brez indeksov in predpomnilnika
     priloga1_data = priloge.get("priloga1", {})
     if not priloga1_data:
         return "Priloga 1 ni na voljo."
+    return _render_priloga1_text(
+        namenska_raba,
+        priloga1_data,
+        _normalize_land_uses(priloga1_data.get("land_uses", [])),
+        _flatten_nrp_conditions(priloga1_data.get("objects", [])),
+    )
+
+
+def _priloga1_text(
+    namenska_raba: str, knowledge: KnowledgeBase, indexes: _KnowledgeIndexes
+) -> str:
+    priloga1_data = knowledge[1].get("priloga1", {})
+    if not priloga1_data:
+        return "Priloga 1 ni na voljo."
+    # Besedilo za posamezno rabo je odvisno le od Priloge 1, zato ga hranimo med
+    # indeksi; le za znane rabe (ključe clen_data_map), da poljuben vhod ne
+    # napolni predpomnilnika
+    text = indexes.priloga1_texts.get(namenska_raba)
+    if text is None:
+        text = _render_priloga1_text(
+            namenska_raba,
+            priloga1_data,
+            indexes.land_uses_normalized,
+            indexes.nrp_conditions_flat,
+        )
+        if namenska_raba in knowledge[3]:
+            indexes.priloga1_texts[namenska_raba] = text
+    return text
 
-    land_uses = priloga1_data.get("land_uses", [])
+
+def _render_priloga1_text(
+    namenska_raba: str,
+    priloga1_data: Dict[str, Any],
+    land_uses_normalized: List[str],
+    all_nrp_conditions: Dict[str, Any],
+) -> str:
     objects = priloga1_data.get("objects", [])
 
-    try:
-        raba_index = -1
-        for i, use in enumerate(land_uses):
-            if namenska_raba.upper() in use.upper().replace(" ", ""):
-                raba_index = i
-                break
-        if raba_index == -1:
-            return f"Namenska raba '{namenska_raba}' ni najdena v Prilogi 1."
-    except ValueError:
+    raba_upper = namenska_raba.upper()
+    raba_index = next(
+        (i for i, use in enumerate(land_uses_normalized) if raba_upper in use), -1
+    )
+    if raba_index == -1:
         return f"Namenska raba '{namenska_raba}' ni najdena v Prilogi 1."
 
     lines = [f"Za namensko rabo '{namenska_raba}' so dovoljeni naslednji enostavni/nezahtevni objekti:\n"]
     referenced_nrp = set()
-    all_nrp_conditions = {k: v for obj in objects for k, v in obj.get("nrp_conditions", {}).items()}
 
     for obj in objects:
         lines.append(f"**{obj['title']}**")
@@ -216,91 +399,135 @@ def build_priloga1_text(
 
     if referenced_nrp:
         lines.append("\n**Legenda navedenih posebnih pogojev (NRP):**")
-        for nrp_num in sorted(referenced_nrp):
-            lines.append(f"- **Pogoj {nrp_num}**: {all_nrp_conditions.get(nrp_num, 'Opis ni na voljo.')}")
+        lines.extend(
+            f"- **Pogoj {nrp_num}**: {all_nrp_conditions.get(nrp_num, 'Opis ni na voljo.')}"
+            for nrp_num in sorted(referenced_nrp)
+        )
 
     return "\n".join(lines)
 
 
+def _podrobni_pogoji(
+    raba_key: str,
+    clen_data: Dict[str, Any],
+    clen_data_map: Dict[str, Any],
+    indexes: _KnowledgeIndexes,
+) -> Tuple[str, List[str]]:
+    """Besedilo podrobnih pogojev in napotila iz njega, izračunana enkrat na rabo."""
+    cached = indexes.podrobni_pogoji.get(raba_key)
+    if cached is None:
+        content = format_structured_content(clen_data["content_structured"])
+        references = sorted(extract_referenced_namenske_rabe(content, clen_data_map))
+        cached = indexes.podrobni_pogoji[raba_key] = (content, references)
+    return cached
+
+
+def _splosni_naslov(i: int, content: str) -> str:
+    naslov_match = _NASLOV_RE.search(content)
+    return f"{i}. člen ({naslov_match.group(1)})" if naslov_match else f"{i}. člen"
+
+
+def _index_splosni_naslovi(katalog: Dict[str, Any]) -> Dict[str, str]:
+    """Naslovi členov splošnih PIP, razčlenjeni enkrat ob nalaganju."""
+    naslovi: Dict[str, str] = {}
+    for i in range(52, 104):
+        clen_key = f"{i}_clen"
+        content = katalog.get(clen_key)
+        if isinstance(content, str) and content:
+            naslovi[clen_key] = _splosni_naslov(i, content)
+    return naslovi
+
+
 def build_requirements_from_db(
     eup_list: List[str],
     raba_list: List[str],
     project_text: str,
     municipality_slug: str | None = None,
 ) -> List[Dict[str, Any]]:
-    opn_katalog, priloge, _, clen_data_map, _, _ = load_knowledge_base(
-        municipality_slug
-    )
+    knowledge, indexes = _load_knowledge(municipality_slug)
+    opn_katalog, priloge, _, clen_data_map, _, _ = knowledge
 
     zahteve: List[Dict[str, Any]] = []
-    dodani_cleni, dodane_namenske_rabe = set(), set()
+
+    def emit(kategorija: str, naslov: str, besedilo: str, clen: str) -> None:
+        # ID dodelimo ob nastanku, glede na zaporedno mesto zahteve
+        zahteve.append(
+            {
+                "kategorija": kategorija,
+                "naslov": naslov,
+                "besedilo": besedilo,
+                "clen": clen,
+                "id": f"Z_{len(zahteve)}",
+            }
+        )
+
+    dodane_namenske_rabe: set[str] = set()
     splosni_pogoji_katalog = opn_katalog.get(
         "splosni_prostorski_izvedbeni_pogoji", {}
     )
+    # Internirani ključi se ujemajo s ključi clen_data_map že po identiteti
     original_rabe_upper = {
-        r.strip().upper()
+        sys.intern(r.strip().upper())
         for r in raba_list
         if isinstance(r, str) and r.strip()
     }
 
-    triggered_optional_cleni: set[str] = set()
-    if project_text:
-        for keyword, pattern in KEYWORD_PATTERNS.items():
-            if pattern.search(project_text):
-                triggered_optional_cleni.add(KEYWORD_TO_CLEN[keyword])
-
-    def add_podrobni_pogoji(raba_key: str, kategorija: str) -> None:
-        raba_key = raba_key.upper()
-        if raba_key in dodane_namenske_rabe:
-            return
-        clen_data = clen_data_map.get(raba_key)
-        if not clen_data:
-            return
-
-        naslov = (
-            f"{clen_data['parent_clen_key'].replace('_clen', '')}. člen - "
-            f"{clen_data['podrocje_naziv']} ({raba_key})"
-        )
-        content = format_structured_content(clen_data["content_structured"])
-        clen_label = f"{clen_data['parent_clen_key'].replace('_clen', '')}. člen"
-        zahteve.append(
-            {
-                "kategorija": kategorija,
-                "naslov": naslov,
-                "besedilo": content,
-                "clen": clen_label,
-            }
-        )
-        dodane_namenske_rabe.add(raba_key)
-        dodani_cleni.add(clen_data["parent_clen_key"])
+    triggered_optional_cleni: set[str] = (
+        _find_triggered_cleni(project_text) if project_text else set()
+    )
 
-        for ref_raba in extract_referenced_namenske_rabe(content, clen_data_map):
-            if ref_raba not in original_rabe_upper:
-                add_podrobni_pogoji(ref_raba, kategorija + " - Napotilo")
+    def add_podrobni_pogoji(start_raba: str, start_kategorija: str) -> None:
+        # Vse rabe so že normalizirane: začetne iz original_rabe_upper, napotila
+        # iz extract_referenced_namenske_rabe (ključi clen_data_map)
+        # Iterativni obhod v globino: vrstni red zahtev ostane enak kot pri rekurziji
+        stack = [(start_raba, start_kategorija)]
+        while stack:
+            raba_key, kategorija = stack.pop()
+            if raba_key in dodane_namenske_rabe:
+                continue
+            clen_data = clen_data_map.get(raba_key)
+            if not clen_data:
+                continue
 
-    for i in range(52, 104):
-        clen_key = f"{i}_clen"
-        is_mandatory = i <= 66
-        if not is_mandatory and clen_key not in triggered_optional_cleni:
-            continue
-        if clen_key in dodani_cleni:
-            continue
+            naslov = (
+                f"{clen_data['parent_clen_key'].replace('_clen', '')}. člen - "
+                f"{clen_data['podrocje_naziv']} ({raba_key})"
+            )
+            content, references = _podrobni_pogoji(raba_key, clen_data, clen_data_map, indexes)
+            clen_label = f"{clen_data['parent_clen_key'].replace('_clen', '')}. člen"
+            emit(
+                kategorija=kategorija,
+                naslov=naslov,
+                besedilo=content,
+                clen=clen_label,
+            )
+            dodane_namenske_rabe.add(raba_key)
+
+            napotilo = kategorija + " - Napotilo"
+            stack.extend(
+                (ref_raba, napotilo)
+                for ref_raba in reversed(references)
+                if ref_raba not in original_rabe_upper
+            )
 
+    splosni_naslovi = indexes.splosni_naslovi
+    sprozeni_cleni = sorted(
+        (_OPTIONAL_CLENS[clen_key], clen_key)
+        for clen_key in triggered_optional_cleni
+        if clen_key in _OPTIONAL_CLENS
+    )
+    for i, clen_key in chain(_MANDATORY_CLENS, sprozeni_cleni):
         content = splosni_pogoji_katalog.get(clen_key)
         if not content:
             continue
-        naslov_match = re.search(r"^\s*\(([^)]+)\)", content)
-        naslov = f"{i}. člen ({naslov_match.group(1)})" if naslov_match else f"{i}. člen"
+        naslov = splosni_naslovi.get(clen_key) or _splosni_naslov(i, content)
         clen_label = f"{i}. člen"
-        zahteve.append(
-            {
-                "kategorija": "Splošni prostorski izvedbeni pogoji (PIP)",
-                "naslov": naslov,
-                "besedilo": content,
-                "clen": clen_label,
-            }
+        emit(
+            kategorija="Splošni prostorski izvedbeni pogoji (PIP)",
+            naslov=naslov,
+            besedilo=content,
+            clen=clen_label,
         )
-        dodani_cleni.add(clen_key)
 
     ciste_namenske_rabe = sorted(
         [r for r in original_rabe_upper if r in clen_data_map]
@@ -308,63 +535,49 @@ def build_requirements_from_db(
     for raba in ciste_namenske_rabe:
         add_podrobni_pogoji(raba, "Podrobni prostorski izvedbeni pogoji (PIP NRP)")
 
-    processed_eups = set()
-    priloga2_entries = priloge.get("priloga2", {}).get("table_entries", [])
-    for eup in eup_list:
-        if not eup:
-            continue
-        normalized_eup = normalize_eup(eup)
-        if normalized_eup in processed_eups:
-            continue
-        found_entry = None
-        for entry in priloga2_entries:
-            priloga_eup = normalize_eup(entry.get("enota_urejanja", ""))
-            if priloga_eup == normalized_eup:
-                found_entry = entry
-                break
+    p2_by_eup = indexes.priloga2_by_eup
+    # Vsako EUP normaliziramo le enkrat; dict.fromkeys obenem odstrani dvojnike
+    for normalized_eup in dict.fromkeys(normalize_eup(eup) for eup in eup_list if eup):
+        found_entry = p2_by_eup.get(normalized_eup)
         if not found_entry:
             continue
         pip = found_entry.get("posebni_pip", "")
         if pip and pip.strip() and pip.strip() != "—":
             eup_name = found_entry.get("enota_urejanja", "")
-            zahteve.append(
-                {
-                    "kategorija": "Posebni prostorski izvedbeni pogoji (PIP EUP)",
-                    "naslov": f"Posebni PIP za EUP: {eup_name}",
-                    "besedilo": pip,
-                    "clen": found_entry.get("clen", ""),
-                }
+            emit(
+                kategorija="Posebni prostorski izvedbeni pogoji (PIP EUP)",
+                naslov=f"Posebni PIP za EUP: {eup_name}",
+                besedilo=pip,
+                clen=found_entry.get("clen", ""),
             )
-            processed_eups.add(normalized_eup)
 
     if ciste_namenske_rabe:
+        priloga1_texts = {r: _priloga1_text(r, knowledge, indexes) for r in ciste_namenske_rabe}
         rabe_za_prilogo1 = [
             r
-            for r in ciste_namenske_rabe
-            if build_priloga1_text(r, priloge)
-            != f"Namenska raba '{r}' ni najdena v Prilogi 1."
+            for r, text in priloga1_texts.items()
+            if text != f"Namenska raba '{r}' ni najdena v Prilogi 1."
         ]
         if rabe_za_prilogo1:
-            priloga1_sections = [
-                f"--- Določila za {raba} --- \n{build_priloga1_text(raba, priloge)}"
-                for raba in rabe_za_prilogo1
-            ]
-            priloga1_content = "\n\n" + "=" * 50 + "\n\n".join(priloga1_sections)
+            buf = io.StringIO()
+            buf.write(_PRILOGA1_HEADER)
+            for index, raba in enumerate(rabe_za_prilogo1):
+                if index:
+                    buf.write(_PRILOGA1_SECTION_SEP)
+                buf.write(f"--- Določila za {raba} --- \n")
+                buf.write(priloga1_texts[raba])
+            priloga1_content = buf.getvalue()
             naslov_rabe = ", ".join(rabe_za_prilogo1)
-            zahteve.append(
-                {
-                    "kategorija": "Skladnost z Prilogo 1 (Enostavni/Nezahtevni objekti)",
-                    "naslov": (
-                        "Preverjanje dopustnosti enostavnih in nezahtevnih objektov za "
-                        f"namenske rabe: {naslov_rabe}"
-                    ),
-                    "besedilo": priloga1_content,
-                    "clen": "",
-                }
+            emit(
+                kategorija="Skladnost z Prilogo 1 (Enostavni/Nezahtevni objekti)",
+                naslov=(
+                    "Preverjanje dopustnosti enostavnih in nezahtevnih objektov za "
+                    f"namenske rabe: {naslov_rabe}"
+                ),
+                besedilo=priloga1_content,
+                clen="",
             )
 
-    for i, zahteva in enumerate(zahteve):
-        zahteva["id"] = f"Z_{i}"
     return zahteve
 
 
@@ -392,11 +605,27 @@ def get_uredba_text(municipality_slug: str | None = None) -> str:
     return load_knowledge_base(municipality_slug)[5]
 
 
+@lru_cache(maxsize=256)
+def _cached_search(
+    query_key: str, slug: str, limit: int
+) -> Tuple[KnowledgeSearchResult, ...]:
+    return tuple(knowledge_repository.search_documents(query_key, slug, limit))
+
+
 def search_knowledge_documents(
-    query: str, municipality_slug: str | None = None, limit: int = 10
+    query: str,
+    municipality_slug: str | None = None,
+    limit: int = 10,
+    no_cache: bool = False,
 ) -> List[Dict[str, Any]]:
     slug = municipality_slug or DEFAULT_MUNICIPALITY_SLUG
-    results = knowledge_repository.search_documents(query, slug, limit)
+    # Iskanje uporablja konfiguracijo 'simple', zato velikost črk in presledki niso pomembni
+    query_key = " ".join(query.lower().split())
+    if no_cache:
+        # Mimo predpomnilnika (npr. takoj po uvozu); rezultat tudi ne zamenja shranjenega
+        results = tuple(knowledge_repository.search_documents(query_key, slug, limit))
+    else:
+        results = _cached_search(query_key, slug, limit)
     return [
         {
             "document_id": result.document_id,
@@ -411,6 +640,16 @@ def search_knowledge_documents(
     ]
 
 
+def invalidate_knowledge_cache() -> None:
+    """Zavrže naloženo bazo znanja in predpomnjena iskanja (npr. po ponovnem uvozu)."""
+    _KB_BY_SLUG.clear()
+    _cached_search.cache_clear()
+
+
+# Vsak uvoz ali posodobitev dokumentov v tem procesu zavrže predpomnjene podatke
+knowledge_repository.on_documents_changed(invalidate_knowledge_cache)
+
+
 __all__ = [
     "KEYWORD_TO_CLEN",
     "KEYWORD_PATTERNS",
@@ -427,4 +666,5 @@ __all__ = [
     "normalize_eup",
     "extract_referenced_namenske_rabe",
     "search_knowledge_documents",
+    "invalidate_knowledge_cache",
 ]
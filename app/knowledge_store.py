@@ -1,38 +1,104 @@
 """Persistent storage layer for the planning knowledge base backed by PostgreSQL."""
 from __future__ import annotations
 
-import json
+import csv
+import io
 import logging
+from concurrent.futures import ThreadPoolExecutor
 from contextlib import contextmanager
 from dataclasses import dataclass
 from datetime import datetime
 from pathlib import Path
-from typing import Any, Dict, Iterable, Iterator, List, Optional, Sequence
+from typing import Any, Callable, Dict, Iterable, Iterator, List, Optional, Sequence, Tuple
 
+import orjson
+from pgvector import HalfVector
+from pgvector.sqlalchemy import HALFVEC
 from sqlalchemy import (
+    Computed,
     DateTime,
-    Float,
     ForeignKey,
     Index,
     Integer,
     String,
     Text,
     UniqueConstraint,
+    bindparam,
     create_engine,
     func,
     select,
     text,
 )
-from sqlalchemy.dialects.postgresql import ARRAY, JSONB
+from sqlalchemy.dialects.postgresql import JSONB, TSVECTOR
+from sqlalchemy.dialects.postgresql import insert as pg_insert
+from sqlalchemy.engine import make_url
 from sqlalchemy.exc import SQLAlchemyError
 from sqlalchemy.orm import DeclarativeBase, Mapped, Session, mapped_column, relationship, sessionmaker
 
-from .config import DATABASE_URL, PROJECT_ROOT
+from .config import (
+    DATABASE_URL,
+    KNOWLEDGE_DB_MAX_OVERFLOW,
+    KNOWLEDGE_DB_POOL_SIZE,
+    KNOWLEDGE_EMBEDDING_DIMENSIONS,
+    PROJECT_ROOT,
+)
 from .municipalities import list_municipality_profiles
 
 logger = logging.getLogger(__name__)
 
 
+def _json_dumps(payload: Any) -> str:
+    return orjson.dumps(payload, option=orjson.OPT_NON_STR_KEYS).decode("utf-8")
+
+
+_CONTENT_TSV_EXPRESSION = "to_tsvector('simple', coalesce(content_text, ''))"
+
+# Razširitev pgvector mora obstajati pred create_all (tipa vector/halfvec)
+_VECTOR_EXTENSION_STEP = (
+    "SELECT NOT EXISTS (SELECT 1 FROM pg_extension WHERE extname = 'vector')",
+    "CREATE EXTENSION IF NOT EXISTS vector",
+)
+
+# Obstoječe tabele (create_all jih ne spreminja) nadgradimo naknadno. Vsak korak
+# ima poizvedbo nad katalogom, ki pove, ali je še potreben, zato ob običajnem
+# zagonu ne izvedemo nobenega DDL ukaza (in ne zaklepamo tabel).
+_SCHEMA_UPGRADES: Tuple[Tuple[str, str], ...] = (
+    (
+        "SELECT NOT EXISTS (SELECT 1 FROM information_schema.columns "
+        "WHERE table_name = 'knowledge_documents' AND column_name = 'content_tsv')",
+        "ALTER TABLE knowledge_documents ADD COLUMN IF NOT EXISTS content_tsv tsvector "
+        f"GENERATED ALWAYS AS ({_CONTENT_TSV_EXPRESSION}) STORED",
+    ),
+    (
+        "SELECT to_regclass('ix_knowledge_documents_content_tsv') IS NULL",
+        "CREATE INDEX IF NOT EXISTS ix_knowledge_documents_content_tsv "
+        "ON knowledge_documents USING gin (content_tsv)",
+    ),
+    (
+        "SELECT to_regclass('ix_knowledge_documents_search') IS NOT NULL",
+        "DROP INDEX IF EXISTS ix_knowledge_documents_search",
+    ),
+    *(
+        # Stari float8[] in vector stolpci se enkrat pretvorijo v halfvec (FP16, pol manj prostora);
+        # HNSW indeks z drugim razredom operatorjev je treba pred pretvorbo odstraniti
+        (
+            "SELECT EXISTS (SELECT 1 FROM information_schema.columns "
+            f"WHERE table_name = '{table}' AND column_name = 'embedding' "
+            "AND (data_type = 'ARRAY' OR udt_name = 'vector'))",
+            f"DROP INDEX IF EXISTS ix_{table}_embedding_hnsw; "
+            f"ALTER TABLE {table} ALTER COLUMN embedding TYPE halfvec({KNOWLEDGE_EMBEDDING_DIMENSIONS}) "
+            f"USING embedding::vector({KNOWLEDGE_EMBEDDING_DIMENSIONS})::halfvec({KNOWLEDGE_EMBEDDING_DIMENSIONS})",
+        )
+        for table in ("knowledge_documents", "knowledge_chunks")
+    ),
+    (
+        "SELECT to_regclass('ix_knowledge_chunks_embedding_hnsw') IS NULL",
+        "CREATE INDEX IF NOT EXISTS ix_knowledge_chunks_embedding_hnsw ON knowledge_chunks "
+        "USING hnsw (embedding halfvec_cosine_ops) WITH (m = 16, ef_construction = 64)",
+    ),
+)
+
+
 class Base(DeclarativeBase):
     """Base declarative class for the knowledge base models."""
 
@@ -69,9 +135,15 @@ class KnowledgeDocument(Base):
     title: Mapped[Optional[str]] = mapped_column(String(255))
     content_json: Mapped[Dict[str, Any]] = mapped_column(JSONB, nullable=False, default=dict)
     content_text: Mapped[str] = mapped_column(Text, default="", nullable=False)
+    # Iskalni vektor izračuna baza ob vsakem zapisu, iskanje ga le bere
+    content_tsv: Mapped[Any] = mapped_column(
+        TSVECTOR, Computed(_CONTENT_TSV_EXPRESSION, persisted=True)
+    )
     # IMPORTANT: attribute name must NOT be 'metadata' (reserved by SQLAlchemy)
     meta: Mapped[Dict[str, Any]] = mapped_column("metadata", JSONB, default=dict, nullable=False)
-    embedding: Mapped[Optional[Sequence[float]]] = mapped_column(ARRAY(Float))
+    embedding: Mapped[Optional[HalfVector]] = mapped_column(
+        HALFVEC(KNOWLEDGE_EMBEDDING_DIMENSIONS)
+    )
     embedding_model: Mapped[Optional[str]] = mapped_column(String(64))
     embedding_updated_at: Mapped[Optional[datetime]] = mapped_column(DateTime)
     created_at: Mapped[datetime] = mapped_column(DateTime, server_default=func.now(), nullable=False)
@@ -93,11 +165,7 @@ class KnowledgeDocument(Base):
             "municipality_id",
             "document_type",
         ),
-        Index(
-            "ix_knowledge_documents_search",
-            text("to_tsvector('simple', coalesce(content_text, ''))"),
-            postgresql_using="gin",
-        ),
+        Index("ix_knowledge_documents_content_tsv", "content_tsv", postgresql_using="gin"),
     )
 
 
@@ -114,7 +182,9 @@ class KnowledgeChunk(Base):
     content: Mapped[str] = mapped_column(Text, nullable=False)
     # IMPORTANT: attribute name must NOT be 'metadata'
     meta: Mapped[Dict[str, Any]] = mapped_column("metadata", JSONB, default=dict, nullable=False)
-    embedding: Mapped[Optional[Sequence[float]]] = mapped_column(ARRAY(Float))
+    embedding: Mapped[Optional[HalfVector]] = mapped_column(
+        HALFVEC(KNOWLEDGE_EMBEDDING_DIMENSIONS)
+    )
     embedding_model: Mapped[Optional[str]] = mapped_column(String(64))
     embedding_updated_at: Mapped[Optional[datetime]] = mapped_column(DateTime)
     created_at: Mapped[datetime] = mapped_column(DateTime, server_default=func.now(), nullable=False)
@@ -127,6 +197,13 @@ class KnowledgeChunk(Base):
     __table_args__ = (
         UniqueConstraint("document_id", "chunk_index", name="uq_knowledge_chunks_index"),
         Index("ix_knowledge_chunks_document", "document_id"),
+        Index(
+            "ix_knowledge_chunks_embedding_hnsw",
+            "embedding",
+            postgresql_using="hnsw",
+            postgresql_with={"m": 16, "ef_construction": 64},
+            postgresql_ops={"embedding": "halfvec_cosine_ops"},
+        ),
         Index(
             "ix_knowledge_chunks_search",
             text("to_tsvector('simple', coalesce(content, ''))"),
@@ -148,6 +225,60 @@ class KnowledgeSearchResult:
     score: float
 
 
+@dataclass
+class KnowledgeChunkResult:
+    """Chunk returned by nearest-neighbour vector search."""
+
+    chunk_id: int
+    document_id: int
+    chunk_index: int
+    content: str
+    distance: float
+
+
+# Poizvedba se sestavi enkrat; websearch_to_tsquery razume tudi narekovaje, OR in "-"
+_SEARCH_STMT = text(
+    """
+    WITH q AS (SELECT websearch_to_tsquery('simple', :query) AS query)
+    SELECT d.id, m.slug AS municipality_slug, d.document_type, d.slug, d.title,
+           ts_headline('simple', d.content_text, q.query) AS snippet,
+           ts_rank_cd(d.content_tsv, q.query) AS score
+    FROM knowledge_documents AS d
+    JOIN knowledge_municipalities AS m ON d.municipality_id = m.id
+    CROSS JOIN q
+    WHERE m.slug = :municipality AND d.content_tsv @@ q.query
+    ORDER BY score DESC
+    LIMIT :limit
+    """
+).bindparams(
+    bindparam("query", type_=Text),
+    bindparam("municipality", type_=String),
+    bindparam("limit", type_=Integer),
+)
+
+
+# Uvoz iste občine iz več delavcev hkrati serializiramo z zaklepom seje
+_BOOTSTRAP_LOCK_STMT = text("SELECT pg_advisory_lock(hashtext(:key))")
+_BOOTSTRAP_UNLOCK_STMT = text("SELECT pg_advisory_unlock(hashtext(:key))")
+
+# Vsaka občina med uvozom zasede do dve povezavi iz bazena
+_BOOTSTRAP_WORKERS = max(1, KNOWLEDGE_DB_POOL_SIZE // 2)
+
+_MISSING = object()
+
+
+def _read_json_file(path: Path) -> Any:
+    """Prebere JSON datoteko za uvoz; ob manjkajoči ali neveljavni datoteki vrne _MISSING."""
+    if not path.exists():
+        logger.warning("Datoteka %s ne obstaja, preskakujem.", path)
+        return _MISSING
+    try:
+        return orjson.loads(path.read_bytes())
+    except (OSError, orjson.JSONDecodeError):
+        logger.exception("Napaka pri nalaganju %s", path)
+        return _MISSING
+
+
 class KnowledgeBaseRepository:
     """Repository handling persistence of the knowledge base in PostgreSQL."""
 
@@ -156,14 +287,61 @@ class KnowledgeBaseRepository:
             raise RuntimeError("❌ DATABASE_URL manjka v .env datoteki!")
 
         self.database_url = database_url
-        self.engine = create_engine(self.database_url, future=True)
+        self._bootstrapped: set[str] = set()
+        # Klici po vsakem zapisu dokumentov (npr. zavrženje predpomnilnikov nad bazo)
+        self._change_listeners: List[Callable[[], None]] = []
+        engine_options: Dict[str, Any] = {}
+        if make_url(self.database_url).get_backend_name() == "postgresql":
+            # Kratka branja si delijo povezave iz bazena namesto vzpostavljanja novih
+            engine_options.update(
+                pool_size=KNOWLEDGE_DB_POOL_SIZE,
+                max_overflow=KNOWLEDGE_DB_MAX_OVERFLOW,
+                pool_pre_ping=True,
+            )
+        # JSONB stolpce (de)serializiramo z orjson namesto s standardnim json
+        self.engine = create_engine(
+            self.database_url,
+            future=True,
+            json_serializer=_json_dumps,
+            json_deserializer=orjson.loads,
+            **engine_options,
+        )
         self.SessionLocal = sessionmaker(bind=self.engine, expire_on_commit=False, future=True)
+        is_postgres = self.engine.dialect.name == "postgresql"
         try:
+            if is_postgres:
+                self._apply_schema_step(*_VECTOR_EXTENSION_STEP)
             Base.metadata.create_all(self.engine)
         except SQLAlchemyError as exc:
             raise RuntimeError(
                 "❌ Povezava s PostgreSQL bazo znanja ni uspela. Preverite DATABASE_URL."
             ) from exc
+        if is_postgres:
+            for check, statement in _SCHEMA_UPGRADES:
+                self._apply_schema_step(check, statement)
+
+    def _apply_schema_step(self, check: str, statement: str) -> None:
+        """Izvede korak sheme le, če je še potreben; neuspeh zabeleži in ne ustavi zagona."""
+        try:
+            with self.engine.begin() as connection:
+                if connection.exec_driver_sql(check).scalar():
+                    connection.exec_driver_sql(statement)
+        except SQLAlchemyError:
+            # Npr. manjkajoče pravice ali vektorji druge dimenzije: aplikacija deluje
+            # naprej, korak pa mora skrbnik baze izvesti ročno.
+            logger.warning(
+                "Nadgradnja sheme baze znanja ni uspela; izvedite jo ročno: %s",
+                statement,
+                exc_info=True,
+            )
+
+    def on_documents_changed(self, listener: Callable[[], None]) -> None:
+        """Registrira klic, ki se izvede po vsakem uspešnem zapisu dokumentov."""
+        self._change_listeners.append(listener)
+
+    def _notify_documents_changed(self) -> None:
+        for listener in self._change_listeners:
+            listener()
 
     @contextmanager
     def session_scope(self) -> Iterator[Session]:
@@ -212,38 +390,124 @@ class KnowledgeBaseRepository:
     ) -> KnowledgeDocument:
         # keep parameter name 'metadata' for callers; map to attribute 'meta'
         metadata = metadata or {}
+        # En sam INSERT ... ON CONFLICT DO UPDATE RETURNING namesto SELECT + UPDATE/INSERT + refresh
+        stmt = pg_insert(KnowledgeDocument).values(
+            municipality_id=municipality.id,
+            document_type=document_type,
+            slug=slug,
+            title=title,
+            content_json=content_json,
+            content_text=content_text,
+            meta=metadata,  # <— attribute is 'meta'
+        )
+        stmt = stmt.on_conflict_do_update(
+            constraint="uq_knowledge_documents_slug",
+            set_={
+                "title": stmt.excluded.title,
+                "content_json": stmt.excluded.content_json,
+                "content_text": stmt.excluded.content_text,
+                "metadata": stmt.excluded["metadata"],
+                "updated_at": func.now(),
+            },
+        ).returning(KnowledgeDocument)
+        with self.session_scope() as session:
+            document = session.scalars(
+                stmt, execution_options={"populate_existing": True}
+            ).one()
+        self._notify_documents_changed()
+        return document
+
+    def upsert_documents(
+        self,
+        municipality: KnowledgeMunicipality,
+        documents: Sequence[Dict[str, Any]],
+    ) -> List[int]:
+        """Vstavi ali posodobi več dokumentov z enim INSERT ... ON CONFLICT stavkom.
+
+        Vsak element vsebuje ključe ``document_type``, ``slug``, ``title``,
+        ``content_json``, ``content_text`` in ``metadata``.
+        """
+        if not documents:
+            return []
+        table = KnowledgeDocument.__table__
+        stmt = pg_insert(table).values(
+            [
+                {
+                    "municipality_id": municipality.id,
+                    "document_type": document["document_type"],
+                    "slug": document["slug"],
+                    "title": document["title"],
+                    "content_json": document["content_json"],
+                    "content_text": document["content_text"],
+                    "metadata": document.get("metadata") or {},
+                }
+                for document in documents
+            ]
+        )
+        stmt = stmt.on_conflict_do_update(
+            constraint="uq_knowledge_documents_slug",
+            set_={
+                "title": stmt.excluded.title,
+                "content_json": stmt.excluded.content_json,
+                "content_text": stmt.excluded.content_text,
+                "metadata": stmt.excluded["metadata"],
+                "updated_at": func.now(),
+            },
+        ).returning(table.c.id)
         with self.session_scope() as session:
-            stmt = select(KnowledgeDocument).where(
-                KnowledgeDocument.municipality_id == municipality.id,
-                KnowledgeDocument.document_type == document_type,
-                KnowledgeDocument.slug == slug,
+            ids = list(session.execute(stmt).scalars())
+        self._notify_documents_changed()
+        return ids
+
+    def _copy_documents(
+        self,
+        municipality: KnowledgeMunicipality,
+        documents: Sequence[Dict[str, Any]],
+    ) -> None:
+        """Prazno občino napolni s COPY ... FROM STDIN (brez poti INSERT za vsako vrstico)."""
+        buffer = io.StringIO()
+        writer = csv.writer(buffer, quoting=csv.QUOTE_ALL, lineterminator="\n")
+        for document in documents:
+            writer.writerow(
+                [
+                    municipality.id,
+                    document["document_type"],
+                    document["slug"],
+                    document["title"] or "",
+                    _json_dumps(document["content_json"]),
+                    document["content_text"],
+                    _json_dumps(document.get("metadata") or {}),
+                ]
             )
-            document = session.execute(stmt).scalar_one_or_none()
-            if document:
-                document.title = title
-                document.content_json = content_json
-                document.content_text = content_text
-                document.meta = metadata  # <— attribute is 'meta'
-                document.updated_at = datetime.utcnow()
-            else:
-                document = KnowledgeDocument(
-                    municipality_id=municipality.id,
-                    document_type=document_type,
-                    slug=slug,
-                    title=title,
-                    content_json=content_json,
-                    content_text=content_text,
-                    meta=metadata,  # <— attribute is 'meta'
+        buffer.seek(0)
+
+        raw_connection = self.engine.raw_connection()
+        try:
+            cursor = raw_connection.cursor()
+            try:
+                cursor.copy_expert(
+                    "COPY knowledge_documents "
+                    "(municipality_id, document_type, slug, title, content_json, content_text, metadata) "
+                    "FROM STDIN WITH (FORMAT csv)",
+                    buffer,
                 )
-                session.add(document)
-            session.commit()
-            session.refresh(document)
-            return document
+            finally:
+                cursor.close()
+            raw_connection.commit()
+        except Exception:
+            raw_connection.rollback()
+            raise
+        finally:
+            raw_connection.close()
+        self._notify_documents_changed()
 
+    # ------------------------------------------------------------------
+    # Branje: Core povezava iz bazena, brez ORM seje in identity map
+    # ------------------------------------------------------------------
     def load_document_json(
         self, municipality_slug: str, document_type: str, slug: str
     ) -> Dict[str, Any]:
-        with self.session_scope() as session:
+        with self.engine.connect() as connection:
             stmt = (
                 select(KnowledgeDocument.content_json)
                 .join(KnowledgeMunicipality)
@@ -253,13 +517,13 @@ class KnowledgeBaseRepository:
                     KnowledgeDocument.slug == slug,
                 )
             )
-            result = session.execute(stmt).scalar_one_or_none()
+            result = connection.execute(stmt).scalar_one_or_none()
             return result or {}
 
     def load_document_text(
         self, municipality_slug: str, document_type: str, slug: str
     ) -> str:
-        with self.session_scope() as session:
+        with self.engine.connect() as connection:
             stmt = (
                 select(KnowledgeDocument.content_text)
                 .join(KnowledgeMunicipality)
@@ -269,9 +533,29 @@ class KnowledgeBaseRepository:
                     KnowledgeDocument.slug == slug,
                 )
             )
-            result = session.execute(stmt).scalar_one_or_none()
+            result = connection.execute(stmt).scalar_one_or_none()
             return result or ""
 
+    def load_documents(
+        self, municipality_slug: str
+    ) -> Dict[Tuple[str, str], Tuple[Dict[str, Any], str]]:
+        """Vse dokumente občine naloži v enem poizvedovanju, po (document_type, slug)."""
+        with self.engine.connect() as connection:
+            stmt = (
+                select(
+                    KnowledgeDocument.document_type,
+                    KnowledgeDocument.slug,
+                    KnowledgeDocument.content_json,
+                    KnowledgeDocument.content_text,
+                )
+                .join(KnowledgeMunicipality)
+                .where(KnowledgeMunicipality.slug == municipality_slug)
+            )
+            return {
+                (document_type, slug): (content_json or {}, content_text or "")
+                for document_type, slug, content_json, content_text in connection.execute(stmt)
+            }
+
     def list_documents(self, municipality_slug: str, document_type: Optional[str] = None) -> List[KnowledgeDocument]:
         with self.session_scope() as session:
             stmt = select(KnowledgeDocument).join(KnowledgeMunicipality).where(
@@ -291,23 +575,10 @@ class KnowledgeBaseRepository:
         if not query.strip():
             return []
 
-        search_stmt = text(
-            """
-            SELECT d.id, m.slug AS municipality_slug, d.document_type, d.slug, d.title,
-                   ts_headline('simple', d.content_text, plainto_tsquery('simple', :query)) AS snippet,
-                   ts_rank_cd(to_tsvector('simple', d.content_text), plainto_tsquery('simple', :query)) AS score
-            FROM knowledge_documents AS d
-            JOIN knowledge_municipalities AS m ON d.municipality_id = m.id
-            WHERE m.slug = :municipality AND to_tsvector('simple', d.content_text) @@ plainto_tsquery('simple', :query)
-            ORDER BY score DESC
-            LIMIT :limit
-            """
-        )
-
         with self.engine.connect() as connection:
             rows = connection.execute(
-                search_stmt, {"query": query, "municipality": municipality_slug, "limit": limit}
-            )
+                _SEARCH_STMT, {"query": query, "municipality": municipality_slug, "limit": limit}
+            ).mappings()
             return [
                 KnowledgeSearchResult(
                     document_id=row["id"],
@@ -321,30 +592,80 @@ class KnowledgeBaseRepository:
                 for row in rows
             ]
 
+    def search_chunks_vector(
+        self,
+        embedding: Sequence[float],
+        k: int = 10,
+        municipality_slug: Optional[str] = None,
+    ) -> List[KnowledgeChunkResult]:
+        """Najbližji odseki po kosinusni razdalji (ORDER BY embedding <=> :q prek HNSW indeksa)."""
+        distance = KnowledgeChunk.embedding.cosine_distance(embedding)
+        stmt = select(
+            KnowledgeChunk.id,
+            KnowledgeChunk.document_id,
+            KnowledgeChunk.chunk_index,
+            KnowledgeChunk.content,
+            distance.label("distance"),
+        ).where(KnowledgeChunk.embedding.is_not(None))
+        if municipality_slug:
+            stmt = (
+                stmt.join(KnowledgeDocument, KnowledgeChunk.document_id == KnowledgeDocument.id)
+                .join(KnowledgeMunicipality)
+                .where(KnowledgeMunicipality.slug == municipality_slug)
+            )
+        stmt = stmt.order_by(distance).limit(k)
+
+        with self.engine.connect() as connection:
+            return [
+                KnowledgeChunkResult(
+                    chunk_id=row["id"],
+                    document_id=row["document_id"],
+                    chunk_index=row["chunk_index"],
+                    content=row["content"],
+                    distance=float(row["distance"]),
+                )
+                for row in connection.execute(stmt).mappings()
+            ]
+
     # ------------------------------------------------------------------
     # Bootstrapping helpers
     # ------------------------------------------------------------------
     def _json_to_text(self, payload: Any) -> str:
-        if payload is None:
-            return ""
-        if isinstance(payload, str):
-            return payload
-        if isinstance(payload, (int, float, bool)):
-            return str(payload)
-        if isinstance(payload, dict):
-            parts = []
-            for key, value in payload.items():
-                parts.append(f"{key}: {self._json_to_text(value)}")
-            return "\n".join(parts)
-        if isinstance(payload, Iterable):
-            return "\n".join(self._json_to_text(item) for item in payload)
-        return str(payload)
+        # Iterativni sprehod s skladom: nizi na skladu se izpišejo, ostala vozlišča razvijejo
+        parts: List[str] = []
+        stack: List[Any] = [payload]
+        while stack:
+            node = stack.pop()
+            if node is None:
+                continue
+            if isinstance(node, str):
+                parts.append(node)
+            elif isinstance(node, (int, float, bool)):
+                parts.append(str(node))
+            elif isinstance(node, dict):
+                items = list(node.items())
+                for index in range(len(items) - 1, -1, -1):
+                    key, value = items[index]
+                    stack.append(value)
+                    stack.append(f"{key}: ")
+                    if index:
+                        stack.append("\n")
+            elif isinstance(node, Iterable):
+                items = list(node)
+                for index in range(len(items) - 1, -1, -1):
+                    stack.append(items[index])
+                    if index:
+                        stack.append("\n")
+            else:
+                parts.append(str(node))
+        return "".join(parts)
 
     def bootstrap_from_files(
         self,
         municipality_slug: str,
         municipality_name: str,
         base_dir: Path | None = None,
+        fresh: bool = False,
     ) -> None:
         base_dir = base_dir or PROJECT_ROOT
         municipality = self.get_or_create_municipality(municipality_slug, municipality_name)
@@ -358,48 +679,101 @@ class KnowledgeBaseRepository:
             ("priloge", "uredba-objekti", base_dir / "UredbaObjekti.json", "Uredba objekti"),
         ]
 
-        for doc_type, slug, path, title in file_map:
-            if not path.exists():
-                logger.warning("Datoteka %s ne obstaja, preskakujem.", path)
+        # Datoteke beremo in razčlenjujemo vzporedno; vrstni red ostane enak kot v file_map
+        with ThreadPoolExecutor(max_workers=len(file_map)) as executor:
+            contents = list(executor.map(_read_json_file, (path for _, _, path, _ in file_map)))
+
+        documents: List[Dict[str, Any]] = []
+        for (doc_type, slug, path, title), content_json in zip(file_map, contents):
+            if content_json is _MISSING:
                 continue
+            documents.append(
+                {
+                    "document_type": doc_type,
+                    "slug": slug,
+                    "title": title,
+                    "content_json": content_json,
+                    "content_text": self._json_to_text(content_json),
+                    "metadata": {
+                        "source_path": str(path),
+                        "imported_at": datetime.utcnow().isoformat(),
+                    },
+                }
+            )
+
+        if fresh and documents:
+            # Občina še nima dokumentov, zato lahko uporabimo COPY namesto INSERT
             try:
-                with path.open("r", encoding="utf-8") as handle:
-                    content_json = json.load(handle)
-            except (OSError, json.JSONDecodeError):
-                logger.exception("Napaka pri nalaganju %s", path)
-                continue
+                self._copy_documents(municipality, documents)
+                return
+            except Exception:
+                logger.warning(
+                    "COPY uvoz za občino '%s' ni uspel, uporabljam upsert.",
+                    municipality_slug,
+                    exc_info=True,
+                )
 
-            content_text = self._json_to_text(content_json)
-            metadata = {"source_path": str(path), "imported_at": datetime.utcnow().isoformat()}
-            self.upsert_document(municipality, doc_type, slug, title, content_json, content_text, metadata)
+        # Vse dokumente zapišemo z enim stavkom namesto SELECT + INSERT/UPDATE na datoteko
+        self.upsert_documents(municipality, documents)
 
     def ensure_bootstrap(self, municipality_slug: str, municipality_name: str) -> None:
-        with self.session_scope() as session:
-            stmt = (
-                select(func.count(KnowledgeDocument.id))
-                .join(KnowledgeMunicipality)
-                .where(KnowledgeMunicipality.slug == municipality_slug)
-            )
-            count = session.execute(stmt).scalar_one() or 0
-        if count == 0:
-            logger.info(
-                "Baza znanja za občino '%s' je prazna. Uvažam podatke iz JSON datotek...",
-                municipality_slug,
-            )
-            self.bootstrap_from_files(municipality_slug, municipality_name)
+        # Preverjene občine si zapomnimo, da jih kasnejši klici ne preštevajo znova
+        if municipality_slug in self._bootstrapped:
+            return
+        with self.engine.connect() as connection:
+            locked = connection.dialect.name == "postgresql"
+            if locked:
+                # Delavci se zvrstijo: kdor čaka, po sprostitvi vidi že uvožene dokumente
+                connection.execute(_BOOTSTRAP_LOCK_STMT, {"key": f"kb_bootstrap:{municipality_slug}"})
+            try:
+                stmt = (
+                    select(func.count(KnowledgeDocument.id))
+                    .join(KnowledgeMunicipality)
+                    .where(KnowledgeMunicipality.slug == municipality_slug)
+                )
+                count = connection.execute(stmt).scalar_one() or 0
+                if count == 0:
+                    logger.info(
+                        "Baza znanja za občino '%s' je prazna. Uvažam podatke iz JSON datotek...",
+                        municipality_slug,
+                    )
+                    self.bootstrap_from_files(municipality_slug, municipality_name, fresh=True)
+            finally:
+                if locked:
+                    connection.execute(
+                        _BOOTSTRAP_UNLOCK_STMT, {"key": f"kb_bootstrap:{municipality_slug}"}
+                    )
+                    connection.commit()
+        self._bootstrapped.add(municipality_slug)
 
 
 knowledge_repository = KnowledgeBaseRepository(DATABASE_URL)
-for municipality_profile in list_municipality_profiles():
-    knowledge_repository.ensure_bootstrap(
-        municipality_profile.knowledge_slug, municipality_profile.name
-    )
+
+
+def bootstrap_municipalities() -> None:
+    """Ob zagonu aplikacije po potrebi napolni bazo znanja za vse občine."""
+    profiles = list_municipality_profiles()
+    if not profiles:
+        return
+    # Občine so neodvisne, zato jih preverimo (in po potrebi uvozimo) vzporedno
+    with ThreadPoolExecutor(max_workers=min(_BOOTSTRAP_WORKERS, len(profiles))) as executor:
+        list(
+            executor.map(
+                lambda profile: knowledge_repository.ensure_bootstrap(
+                    profile.knowledge_slug, profile.name
+                ),
+                profiles,
+            )
+        )
+
 
 __all__ = [
     "KnowledgeMunicipality",
     "KnowledgeDocument",
     "KnowledgeChunk",
     "KnowledgeSearchResult",
+    "KnowledgeChunkResult",
     "KnowledgeBaseRepository",
     "knowledge_repository",
+    "bootstrap_municipalities",
 ]
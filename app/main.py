@@ -1,5 +1,9 @@
 # app/main.py (posodobljena verzija z varnostnimi izboljšavami)
 
+import asyncio
+import logging
+import os
+
 from fastapi import FastAPI, Request
 from fastapi.middleware.cors import CORSMiddleware
 from fastapi.staticfiles import StaticFiles
@@ -8,13 +12,12 @@ from slowapi.util import get_remote_address
 from slowapi.errors import RateLimitExceeded
 
 from .database import db_manager
+from .knowledge_store import bootstrap_municipalities
 from .routes import router
 from .gurs_routes import router as gurs_router
 from .logging_config import setup_logging
 from .config import PROJECT_ROOT, ALLOWED_ORIGINS, RATE_LIMIT_PER_MINUTE, DEBUG
 from .middleware import log_requests_middleware
-import logging
-import os
 
 logger = logging.getLogger(__name__)
 
@@ -84,10 +87,26 @@ async def startup_event():
             logger.warning("=" * 80)
 
     await db_manager.init_db()
+    # Bazo znanja preverimo v ozadju: drug delavec lahko med uvozom drži advisory
+    # lock in zagon ne sme čakati nanj. Zahteva, ki bazo potrebuje prej, uvoz
+    # počaka sama (ensure_bootstrap v load_knowledge_base).
+    app.state.knowledge_bootstrap = asyncio.create_task(
+        asyncio.to_thread(bootstrap_municipalities)
+    )
+    app.state.knowledge_bootstrap.add_done_callback(_log_bootstrap_failure)
+
+def _log_bootstrap_failure(task: asyncio.Task) -> None:
+    if not task.cancelled() and task.exception() is not None:
+        logger.error(
+            "Uvoz baze znanja ob zagonu ni uspel; poskusi se ob prvi uporabi.",
+            exc_info=task.exception(),
+        )
 
 @app.on_event("shutdown")
 async def shutdown_event():
     """Cleanup ob zaustavitvi aplikacije."""
+    await db_manager.close()
+
     # Zapremo Redis povezavo
     from .cache import cache_manager
     if hasattr(cache_manager, 'client'):
@@ -2,7 +2,7 @@
 from __future__ import annotations
 
 from dataclasses import dataclass, field
-from typing import Any, Dict, List, Optional, Set
+from typing import Any, Dict, List, Optional, Set, Tuple
 
 from .config import DEFAULT_MUNICIPALITY_NAME, DEFAULT_MUNICIPALITY_SLUG
 
@@ -59,6 +59,30 @@ _MUNICIPALITIES: Dict[str, MunicipalityProfile] = {
 }
 
 
+def _build_domain_index() -> Tuple[
+    Dict[str, Tuple[int, MunicipalityProfile]], List[Tuple[int, str, MunicipalityProfile]]
+]:
+    """Index lower-cased e-mail domains with the declaration rank of their profile.
+
+    Exact "@domain" entries are keyed by domain, the rest kept as ordered suffixes;
+    the rank lets a lookup keep "first profile in declaration order wins".
+    """
+
+    index: Dict[str, Tuple[int, MunicipalityProfile]] = {}
+    suffixes: List[Tuple[int, str, MunicipalityProfile]] = []
+    for rank, profile in enumerate(_MUNICIPALITIES.values()):
+        for candidate in sorted(profile.email_domains):
+            candidate = candidate.lower()
+            if candidate.startswith("@"):
+                index.setdefault(candidate, (rank, profile))
+            else:
+                suffixes.append((rank, candidate, profile))
+    return index, suffixes
+
+
+_DOMAIN_INDEX, _DOMAIN_SUFFIXES = _build_domain_index()
+
+
 def list_municipality_profiles() -> List[MunicipalityProfile]:
     """Return all configured municipality profiles."""
 
@@ -93,11 +117,16 @@ def match_municipality_by_email(email: str) -> Optional[MunicipalityProfile]:
     if at_index == -1:
         return None
     domain = normalized[at_index:]
-    for profile in _MUNICIPALITIES.values():
-        for candidate in profile.email_domains:
-            if domain.endswith(candidate.lower()):
-                return profile
-    return None
+    # *domain* starts with its only "@", so an "@..." candidate can only match it exactly.
+    # A suffix entry wins only if its profile is declared before the exact match.
+    exact = _DOMAIN_INDEX.get(domain)
+    limit = exact[0] if exact is not None else len(_MUNICIPALITIES)
+    for rank, candidate, profile in _DOMAIN_SUFFIXES:
+        if rank >= limit:
+            break
+        if domain.endswith(candidate):
+            return profile
+    return exact[1] if exact is not None else None
 
 
 def municipality_public_payload() -> List[Dict[str, Any]]:
@@ -2,6 +2,7 @@
 from __future__ import annotations
 
 import io
+import re
 from pathlib import Path
 from typing import BinaryIO, List, Optional, Union
 
@@ -11,22 +12,47 @@ from pypdf import PdfReader
 
 PDFInput = Union[str, Path, bytes, BinaryIO]
 
+# Število v slovnici int(): neobvezen "+", (tudi unicode) števke in posamični
+# podčrtaji med njimi ("+5", "1_0"). Predznak "-" je ločilo razpona.
+_PAGE_NUMBER = r"\s*(\+?\d(?:_?\d)*)\s*"
+_PAGE_PART_RE = re.compile(rf"(?:^|,){_PAGE_NUMBER}(?:-{_PAGE_NUMBER})?(?=,|$)")
+
+
+def _read_pdf_source(source: PDFInput) -> Union[str, bytes]:
+    """Pot vrne kot niz, ostale vire kot bajte (datotečnemu objektu ohrani pozicijo)."""
+    if isinstance(source, (str, Path)):
+        return str(source)
+    if isinstance(source, bytes):
+        return source
+    if hasattr(source, "seek") and hasattr(source, "tell"):
+        position = source.tell()
+        source.seek(0)
+        data = source.read()
+        source.seek(position)
+        return data
+    return source.read()
+
+
+def _extract_text_pypdf(pdf_data: Union[str, bytes]) -> str:
+    pdf = PdfReader(pdf_data if isinstance(pdf_data, str) else io.BytesIO(pdf_data))
+    return "".join(page.extract_text() or "" for page in pdf.pages)
+
 
 def parse_pdf(source: PDFInput) -> str:
     try:
-        if isinstance(source, (str, Path)):
-            pdf = PdfReader(str(source))
-        elif isinstance(source, bytes):
-            pdf = PdfReader(io.BytesIO(source))
-        else:
-            if hasattr(source, "seek") and hasattr(source, "tell"):
-                position = source.tell()
-                source.seek(0)
-                pdf = PdfReader(source)
-                source.seek(position)
+        pdf_data = _read_pdf_source(source)
+        try:
+            import fitz  # type: ignore
+
+            # PyMuPDF izlušči besedilo v C, pypdf ostane le kot rezerva
+            if isinstance(pdf_data, str):
+                doc = fitz.open(pdf_data)
             else:
-                pdf = PdfReader(source)
-        text = "".join(page.extract_text() or "" for page in pdf.pages)
+                doc = fitz.open(stream=pdf_data, filetype="pdf")
+            with doc:
+                text = "".join([page.get_text("text") for page in doc])
+        except Exception:
+            text = _extract_text_pypdf(pdf_data)
         return text.strip()
     except Exception as exc:  # pragma: no cover - depends on PDFs
         raise HTTPException(status_code=400, detail=f"Napaka pri branju PDF: {exc}") from exc
@@ -36,25 +62,13 @@ def parse_page_string(page_str: str) -> List[int]:
     if not page_str:
         return []
     pages = set()
-    for part in page_str.split(','):
-        part = part.strip()
-        if not part:
-            continue
-        if '-' in part:
-            try:
-                start, end = map(int, part.split('-'))
-            except ValueError:
-                continue
-            if start > 0 and end >= start:
-                pages.update(range(start - 1, end))
-        else:
-            try:
-                page_num = int(part)
-            except ValueError:
-                continue
-            if page_num > 0:
-                pages.add(page_num - 1)
-    return sorted(list(pages))
+    # Vsi veljavni deli ("5" ali "3-7") v enem prehodu; neveljavni deli se preskočijo
+    for start, end in _PAGE_PART_RE.findall(page_str):
+        start = int(start)
+        end = int(end) if end else start
+        if start > 0 and end >= start:
+            pages.update(range(start - 1, end))
+    return sorted(pages)
 
 
 def convert_pdf_pages_to_images(
@@ -87,12 +101,9 @@ def convert_pdf_pages_to_images(
         for page_num in page_numbers:
             if 0 <= page_num < len(doc):
                 page = doc.load_page(page_num)
-                pix = page.get_pixmap(dpi=200)
-                img_bytes = pix.tobytes("png")
-                img = Image.open(io.BytesIO(img_bytes))
-                # POMEMBNO: Naloži sliko v pomnilnik TAKOJ, preden se BytesIO zapre
-                img.load()
-                images.append(img)
+                pix = page.get_pixmap(dpi=200, alpha=False)
+                # Surove RGB vzorce predamo PIL neposredno, brez kodiranja v PNG in nazaj
+                images.append(Image.frombytes("RGB", (pix.width, pix.height), pix.samples))
         doc.close()
     except Exception as exc:  # pragma: no cover - depends on PDFs
         print(f"⚠️ Napaka pri pretvorbi PDF v slike: {exc}")
@@ -9,11 +9,11 @@ are rendered as multiline bullet lists.
 from __future__ import annotations
 
 import argparse
-import json
 from datetime import datetime
 from pathlib import Path
 from typing import Any, Dict, List, Optional
 
+import orjson
 from docx import Document
 from docx.enum.section import WD_ORIENT
 from docx.enum.text import WD_ALIGN_PARAGRAPH
@@ -621,8 +621,7 @@ def fill_priloga10a(
 
 
 def _load_data_json(path: str) -> Dict[str, Any]:
-    with open(path, "r", encoding="utf-8") as handle:
-        return json.load(handle)
+    return orjson.loads(Path(path).read_bytes())
 
 
 def main(argv: Optional[List[str]] = None) -> int:
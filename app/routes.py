@@ -21,7 +21,7 @@ from .cache import cache_manager
 from .config import ANALYSIS_CHUNK_SIZE
 from .database import compute_session_summary, db_manager
 from .files import save_revision_files
-from .forms import generate_priloga_10a
+from .forms import generate_priloga_10a_async
 from .frontend import build_homepage
 from .knowledge_base import (
     build_requirements_from_db,
@@ -803,7 +803,7 @@ async def upload_revision(
         raise HTTPException(status_code=400, detail="Ni veljavnih popravljenih dokumentov.")
 
     primary_requirement = parsed_ids[0] if len(parsed_ids) == 1 else None
-    filenames, file_paths, mime_types = save_revision_files(
+    filenames, file_paths, mime_types = await save_revision_files(
         session_id, stored_files_payload, requirement_id=primary_requirement
     )
 
@@ -982,8 +982,7 @@ async def confirm_report(
             generate_word_report,
             filtered_zahteve, cache.get("results_map", {}), metadata, str(docx_output), report_format
         )
-        xlsx_path = await asyncio.to_thread(
-            generate_priloga_10a,
+        xlsx_path = await generate_priloga_10a_async(
             filtered_zahteve, cache.get("results_map", {}), metadata,
             cache.get("final_key_data", {}), cache.get("source_files", []), str(xlsx_output)
         )
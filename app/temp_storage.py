@@ -1,10 +1,13 @@
 # app/temp_storage.py (NOVA DATOTEKA)
 
 import asyncio
+import fcntl
 import io
 import logging
+import os
 import re
 import shutil
+from concurrent.futures import ThreadPoolExecutor
 from pathlib import Path
 from typing import List
 
@@ -12,11 +15,62 @@ import aiofiles
 from fastapi import HTTPException
 from PIL import Image
 
-from .config import TEMP_STORAGE_PATH
+from .config import TEMP_IMG_CONCURRENCY, TEMP_STORAGE_PATH
 from .security import validate_session_id, validate_path_safety
 
 logger = logging.getLogger(__name__)
 
+_CPU_COUNT = os.cpu_count() or 1
+
+# Število niti za vzporedno brisanje slik ob čiščenju seje
+_CLEANUP_WORKERS = 8
+
+# Datoteka s števcem zadnjega uporabljenega indeksa slike v mapi seje in datoteka,
+# na kateri s flock zaklenemo rezervacijo (števec se zamenja z os.replace, zato
+# zaklepamo ločeno datoteko, ki ostane ista)
+_INDEX_COUNTER_NAME = ".next"
+_INDEX_LOCK_NAME = ".next.lock"
+
+def _scan_existing_index(session_dir: Path) -> int:
+    """Poišče najvišji indeks obstoječih slik (le za mape brez števca)."""
+    existing_indices = []
+    for path in session_dir.glob("image_*.png"):
+        match = re.search(r"image_(\d+)\.png$", path.name)
+        if match:
+            try:
+                existing_indices.append(int(match.group(1)))
+            except ValueError:
+                continue
+    return max(existing_indices, default=0)
+
+def _reserve_image_indices(session_dir: Path, count: int) -> int:
+    """Rezervira `count` indeksov in vrne zadnji že uporabljeni indeks.
+
+    flock velja za ločene odprtine datoteke, zato izključi tako druge niti kot
+    druge procese (več workerjev), ki shranjujejo v isto sejo.
+    """
+    lock_fd = os.open(session_dir / _INDEX_LOCK_NAME, os.O_RDWR | os.O_CREAT, 0o600)
+    try:
+        fcntl.flock(lock_fd, fcntl.LOCK_EX)
+        return _bump_index_counter(session_dir, count)
+    finally:
+        os.close(lock_fd)
+
+def _bump_index_counter(session_dir: Path, count: int) -> int:
+    counter_path = session_dir / _INDEX_COUNTER_NAME
+    try:
+        start_index = int(counter_path.read_text(encoding="ascii").strip() or 0)
+    except FileNotFoundError:
+        start_index = _scan_existing_index(session_dir)
+    except ValueError:
+        logger.warning(f"Poškodovan števec slik v {session_dir}, ponovno skeniram mapo.")
+        start_index = _scan_existing_index(session_dir)
+
+    tmp_path = counter_path.with_name(f"{_INDEX_COUNTER_NAME}.tmp")
+    tmp_path.write_text(str(start_index + count), encoding="ascii")
+    os.replace(tmp_path, counter_path)
+    return start_index
+
 async def save_images_for_session(session_id: str, images: List[Image.Image]) -> List[str]:
     """Asinhrono shrani PIL slike na disk in vrne seznam njihovih poti."""
     # VARNOSTNO: Validiraj session_id format
@@ -37,42 +91,76 @@ async def save_images_for_session(session_id: str, images: List[Image.Image]) ->
 
     session_dir.mkdir(exist_ok=True, parents=True)
 
-    existing_indices = []
-    for path in session_dir.glob("image_*.png"):
-        match = re.search(r"image_(\d+)\.png$", path.name)
-        if match:
-            try:
-                existing_indices.append(int(match.group(1)))
-            except ValueError:
-                continue
-    start_index = max(existing_indices, default=0)
+    start_index = await asyncio.to_thread(_reserve_image_indices, session_dir, len(images))
+
+    # Omejimo število hkratnih zapisov, da PNG medpomnilniki ne napolnijo RAM-a
+    semaphore = asyncio.Semaphore(TEMP_IMG_CONCURRENCY)
+
+    async def _bounded_save(img: Image.Image, path: Path):
+        async with semaphore:
+            await _save_single_image(img, path)
 
     saved_paths = []
     tasks = []
 
     for offset, img in enumerate(images, start=1):
         img_path = session_dir / f"image_{start_index + offset}.png"
-        tasks.append(_save_single_image(img, img_path))
+        tasks.append(_bounded_save(img, img_path))
         saved_paths.append(str(img_path))
-    
+
     await asyncio.gather(*tasks)
     logger.info(f"[{session_id}] Shranjenih {len(images)} slik v mapo {session_dir}")
     return saved_paths
 
-async def _save_single_image(img: Image.Image, path: Path):
-    """Pomožna funkcija za shranjevanje ene slike."""
+def _encode_png_bytes(img: Image.Image) -> bytes:
+    """Zakodira sliko v PNG; zlib med stiskanjem sprosti GIL, zato teče v niti."""
     with io.BytesIO() as buffer:
         img.save(buffer, format="PNG")
-        content = buffer.getvalue()
-    
+        return buffer.getvalue()
+
+async def _save_single_image(img: Image.Image, path: Path):
+    """Pomožna funkcija za shranjevanje ene slike."""
+    content = await asyncio.to_thread(_encode_png_bytes, img)
+
     async with aiofiles.open(path, "wb") as f:
         await f.write(content)
 
+def _open_and_load(path: str) -> Image.Image:
+    """Odpre sliko in jo takoj dekodira v pomnilnik (datoteka se nato zapre)."""
+    img = Image.open(path)
+    img.load()
+    return img
+
+def _load_images_batch(image_paths: List[str]) -> List[Image.Image]:
+    """Vzporedno dekodira slike; Pillow med dekodiranjem PNG sprosti GIL."""
+    if not image_paths:
+        return []
+    with ThreadPoolExecutor(max_workers=min(_CPU_COUNT, len(image_paths))) as executor:
+        return list(executor.map(_open_and_load, image_paths))
+
 async def load_images_from_paths(image_paths: List[str]) -> List[Image.Image]:
     """Asinhrono naloži slike z diska na podlagi seznama poti."""
-    tasks = [asyncio.to_thread(Image.open, path) for path in image_paths]
-    images = await asyncio.gather(*tasks)
-    return images
+    return await asyncio.to_thread(_load_images_batch, list(image_paths))
+
+def _fast_rmtree(session_dir: Path) -> None:
+    """Vzporedno izbriše datoteke v mapi seje (unlink sprosti GIL) in nato mapo."""
+    file_paths = []
+    has_subdirs = False
+    with os.scandir(session_dir) as entries:
+        for entry in entries:
+            if entry.is_dir(follow_symlinks=False):
+                has_subdirs = True
+            else:
+                file_paths.append(entry.path)
+
+    if file_paths:
+        with ThreadPoolExecutor(max_workers=min(_CLEANUP_WORKERS, len(file_paths))) as executor:
+            list(executor.map(os.unlink, file_paths))
+
+    if has_subdirs:
+        shutil.rmtree(session_dir)
+    else:
+        os.rmdir(session_dir)
 
 async def cleanup_session_storage(session_id: str):
     """Počisti začasno mapo s slikami za določeno sejo."""
@@ -94,8 +182,8 @@ async def cleanup_session_storage(session_id: str):
 
     if session_dir.exists():
         try:
-            # shutil.rmtree je blokirajoča operacija, zato jo poženemo v ločeni niti
-            await asyncio.to_thread(shutil.rmtree, session_dir)
+            # Brisanje je blokirajoče, zato ga poženemo v ločeni niti
+            await asyncio.to_thread(_fast_rmtree, session_dir)
             logger.info(f"[{session_id}] Počiščena začasna mapa: {session_dir}")
         except Exception as e:
             logger.error(f"[{session_id}] Napaka pri čiščenju mape {session_dir}: {e}")
\ No newline at end of file
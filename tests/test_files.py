@@ -0,0 +1,51 @@
+# tests/test_files.py
+
+import io
+
+import pytest
+
+import app.files as files
+from app.files import save_revision_files
+
+
+@pytest.fixture
+def data_dir(tmp_path, monkeypatch):
+    """Revizije shranjujemo v začasno mapo namesto v pravi DATA_DIR."""
+    monkeypatch.setattr(files, "DATA_DIR", tmp_path)
+    monkeypatch.setattr(files, "REVISION_ROOT", tmp_path / "revisions")
+    return tmp_path
+
+
+@pytest.mark.asyncio
+async def test_save_revision_files_keeps_same_named_uploads(data_dir):
+    """Dve naložitvi z enakim imenom se shranita v ločeni, nepoškodovani datoteki."""
+    first = b"%PDF-1.4 prva revizija " + b"A" * 200_000
+    second = b"%PDF-1.4 druga revizija " + b"B" * 150_000
+
+    filenames, file_paths, mime_types = await save_revision_files(
+        "test-session-same-names",
+        [
+            ("mapa1/revizija.pdf", first, "application/pdf"),
+            ("mapa2/revizija.pdf", second, "application/pdf"),
+        ],
+    )
+
+    assert filenames == ["mapa1/revizija.pdf", "mapa2/revizija.pdf"]
+    assert mime_types == ["application/pdf", "application/pdf"]
+    assert len(set(file_paths)) == 2
+    assert (data_dir / file_paths[0]).read_bytes() == first
+    assert (data_dir / file_paths[1]).read_bytes() == second
+
+
+@pytest.mark.asyncio
+async def test_save_revision_files_copies_file_objects(data_dir):
+    """Datotečni objekt se prekopira v celoti, od začetka, ne glede na trenutni položaj."""
+    payload = b"%PDF-1.4 " + bytes(range(256)) * 1_000
+    upload = io.BytesIO(payload)
+    upload.seek(100)
+
+    _, file_paths, _ = await save_revision_files(
+        "test-session-file-object", [("revizija.pdf", upload, "application/pdf")]
+    )
+
+    assert (data_dir / file_paths[0]).read_bytes() == payload
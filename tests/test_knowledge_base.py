@@ -0,0 +1,21 @@
+# tests/test_knowledge_base.py
+
+from app.knowledge_base import extract_referenced_namenske_rabe
+
+
+def test_extract_referenced_namenske_rabe_keeps_overlapping_references():
+    """Napotila, ki si delijo besedilo, se ujamejo vsa."""
+    clen_data_map = {"KOT": {}, "SS": {}, "A": {}}
+
+    found = extract_referenced_namenske_rabe("Veljajo določila za kot pri SS.", clen_data_map)
+
+    assert sorted(found) == ["KOT", "SS"]
+
+
+def test_extract_referenced_namenske_rabe_ignores_unknown_keys():
+    """Vrne le namenske rabe, ki obstajajo v clen_data_map."""
+    clen_data_map = {"SS": {}}
+
+    found = extract_referenced_namenske_rabe("Smiselno veljajo pogoji za SS in za XY.", clen_data_map)
+
+    assert found == ["SS"]
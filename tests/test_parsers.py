@@ -0,0 +1,21 @@
+# tests/test_parsers.py
+
+import pytest
+
+from app.parsers import parse_page_string
+
+
+@pytest.mark.parametrize(
+    "page_str, expected",
+    [
+        ("1, 3-4", [0, 2, 3]),
+        ("+5", [4]),
+        ("1-+3", [0, 1, 2]),
+        ("1_0", [9]),
+        ("1-2-3,-3,2a,0,5-4", []),
+        ("", []),
+    ],
+)
+def test_parse_page_string_follows_int_grammar(page_str, expected):
+    """Zapis strani se razčleni enako kot z int(), neveljavni deli se preskočijo."""
+    assert parse_page_string(page_str) == expected